@@ -0,0 +1,87 @@
+"""
+File of named numpy arrays that is memory-mapped back instead of unpickled
+"""
+import os
+import json
+import tempfile
+import mmap
+import numpy as np
+
+
+class ArrayFile:
+    """
+    Writes a JSON header line followed by the raw bytes of each array, aligned so every array can be
+    used in place from a read-only memory map
+    """
+
+    ALIGN = 64
+    # permissions of a written file; temporary files are created readable by their owner only
+    MODE = 0o644
+
+    def __init__(self, file_name, magic):
+        """
+        Initialize with the file and the bytes that identify its kind
+        :param file_name: the file
+        :param magic: bytes the file starts with
+        """
+        self.file_name = file_name
+        self.magic = magic
+
+    def save(self, arrays, info=None):
+        """
+        Write the arrays, replacing the file only once it is complete
+        :param arrays: list of (name, array) pairs; a name may repeat
+        :param info: JSON-serializable metadata to store in the header
+        :return: void
+        """
+        header = {'info': info, 'arrays': []}
+        offset = 0
+        for name, array in arrays:
+            header['arrays'].append((name, array.dtype.str, array.shape, offset))
+            offset = self.align(offset + array.nbytes)
+
+        # each writer has its own temporary file, so processes writing the same file at once do not mix their bytes
+        directory, name = os.path.split(self.file_name)
+        fd, tmp_file = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory or '.')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(self.magic + json.dumps(header).encode() + b'\n')
+                start = self.align(out.tell())
+                for (_, _, _, offset), (_, array) in zip(header['arrays'], arrays):
+                    out.seek(start + offset)
+                    out.write(np.ascontiguousarray(array).tobytes())
+            os.chmod(tmp_file, self.MODE)
+            os.replace(tmp_file, self.file_name)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+    def load(self):
+        """
+        Memory-map the arrays, so processes reading the same file share its pages
+        :return: dict of name to the list of arrays with that name, and the metadata
+        """
+        with open(self.file_name, 'rb') as f:
+            if f.read(len(self.magic)) != self.magic:
+                raise ValueError(self.file_name + " is not a " + self.magic.decode() + " file")
+            header = json.loads(f.readline().decode())
+            start = self.align(f.tell())
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        arrays = {}
+        for name, dtype, shape, offset in header['arrays']:
+            count = int(np.prod(shape))
+            if count:
+                array = np.frombuffer(buffer, dtype=dtype, count=count, offset=start + offset).reshape(shape)
+            else:
+                array = np.empty(shape, dtype=dtype)
+            arrays.setdefault(name, []).append(array)
+        return arrays, header['info']
+
+    def align(self, offset):
+        """
+        Round an offset up to the array alignment
+        :param offset: byte offset
+        :return: int
+        """
+        return -(-offset // self.ALIGN) * self.ALIGN
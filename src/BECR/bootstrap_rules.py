@@ -7,17 +7,43 @@ Parser
 """
 import os
 import sys
+import time
+import tempfile
+import heapq
+from multiprocessing import Pool
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from scipy import spatial
+import numpy as np
 import pickle
 from src.BECR.seed import Seed
+from src.BECR.context_matrix import ContextMatrix
+from src.BECR.seed_model import SeedModel
+from src.BECR.seed_patterns import SeedPatterns
+from src.BECR.candidate_store import CandidateStore
+from src.BECR.sweep import ParameterSweep
+from src.BECR.scoring_service import ScoringService
 from src.BECR.becr_dependency_rule_extractor import BECREmotionCauseRuleExtractor
 from src.BECR.becr_dependency_tweet_loader import BECRTweetLoader
+from src.BECR.checkpoint import IngestCheckpoint
+from src.baseline.conll_reader import ConllReader
 import argparse
 
 
 class RuleBootstrapper:
 
+    # the fewest candidates per process worth scoring in a pool
+    SCORE_CHUNK = 1024
+    # bound on the rounding difference between matrix and scipy similarities; pairs within it of a
+    # threshold or of the best score are rescored with cosine_sim so decisions and scores stay exact
+    EXACT_MARGIN = 1e-9
+    # where matrices shared with scoring workers are written, if it exists
+    SHARED_DIR = '/dev/shm'
+    # the attributes of a bootstrapper that score_rows reads
+    SCORING_SETTINGS = ('alpha', 'beta', 'gamma', 'delta', 'epsilon', 'neg_alpha', 'neg_beta', 'neg_gamma',
+                        'neg_delta', 'neg_epsilon', 'neg_tau')
+    # the model that training writes and the test phase scores against
+    TEST_SEEDS_FILE = '../../lib/seeds/test_seeds.model'
+
     def __init__(self, args):
         """
         Initialize by setting tau and cycle thresholds for cosine similarity scores between seed matches and
@@ -27,6 +53,7 @@ class RuleBootstrapper:
         self.tau = args.tau
         self.neg_tau = args.neg_tau
         self.cycles = args.cycles
+        self.min_new_seeds = args.min_new_seeds
         self.alpha = args.alpha
         self.beta = args.beta
         self.gamma = args.gamma
@@ -39,21 +66,156 @@ class RuleBootstrapper:
         self.neg_epsilon = args.neg_epsilon
         self.glove_size = args.glove_size
         self.is_test = args.test
+        self.use_cache = not args.no_cache
+        self.workers = args.workers
+        self.pattern_tau = args.pattern_tau
+        self.memory_budget = args.memory_budget
+        self.candidate_store = args.candidate_store
+        # context vectors are summed in float64 either way, then stored in this type
+        Seed.dtype = np.float32 if args.float32 else np.float64
+        self.incremental = args.incremental
+        self.top_k = args.top_k
+        self.stream = args.stream
+        # the output file relations are written to as they are accepted, in stream mode
+        self.relation_out = None
         self.predicted_relations = []
+        self.test_seeds = None
+        # patterns of the seed matches of a training run, and of the test seeds
+        self.seed_patterns = self.test_patterns = None
         self.seed_pairs = pickle.load(open('../../lib/seeds/train_seeds.pkl', "rb"))
+        self.neg_seed_pairs = self.load_seed_pairs(args.neg_seeds) if args.neg_seeds else {}
+        self.sweep = ParameterSweep(self, args.sweep) if args.sweep else None
+
+    def __getstate__(self):
+        """
+        Only the settings score_rows uses go to the copy of this bootstrapper each scoring worker gets, so the seed
+        pairs, seeds and relations stay in this process
+        :return: dict
+        """
+        return {name: self.__dict__[name] for name in self.SCORING_SETTINGS}
+
+    @staticmethod
+    def load_seed_pairs(file_name):
+        """
+        Load emotion cause pairs, either pickled like train_seeds.pkl (a dict of emotion text to list of cause texts)
+        or as text like ../../lib/seeds/train_seeds.txt, where each line is an emotion, a colon and its causes
+        separated by commas, e.g. "bad: appendicitis, evening". The emotion is the text before the first colon, so it
+        cannot hold one, and a cause cannot hold a comma; spaces around both are dropped. Lines without a colon and
+        empty causes are skipped, and the causes of an emotion on several lines are joined
+        :param file_name: the seed file
+        :return: dict of emotion text to list of cause texts
+        """
+        if file_name.endswith('.pkl'):
+            return pickle.load(open(file_name, "rb"))
+        seed_pairs = {}
+        with open(file_name, 'r') as f:
+            for line in f:
+                if ':' in line:
+                    emotion, causes = line.split(':', 1)
+                    seed_pairs.setdefault(emotion.strip(), []).extend(c.strip() for c in causes.split(',')
+                                                                      if c.strip())
+        return seed_pairs
+
+    def process_file(self, parsed_tweet_file, output_file):
+        """
+        Run BECR on one parsed tweet file; the keyword list, GLoVe embeddings and test seeds
+        stay loaded between files
+        :param parsed_tweet_file: the TweeboParser output file
+        :param output_file: the output file name
+        :return: void
+        """
+        start, end, first_tweet = 0, None, 0
+        if self.incremental:
+            checkpoint = IngestCheckpoint(output_file)
+            start, first_tweet = checkpoint.load(parsed_tweet_file)
+            end = ConllReader(parsed_tweet_file, start).last_boundary()
+            if end == start:
+                # no tweets were appended since the last run
+                return
+
+        tweets = BECRTweetLoader(parsed_tweet_file, use_cache=self.use_cache, workers=self.workers,
+                                 start=start, end=end, first_tweet=first_tweet)
+        emo_list = self.get_emo_list(tweets)
+
+        self.load_models()
+        self.predicted_relations = []
+        self.seed_patterns = None
+
+        if not self.is_test:
+            seed_matches = self.get_seed_matches(emo_list, tweets.tweets_by_idx)
+        else:
+            seed_matches = self.test_seeds
+
+        if self.sweep:
+            candidates = self.set_all_contexts(emo_list, tweets.tweets_by_idx)
+            self.sweep.run(candidates, seed_matches, output_file)
+            return
+
+        with open(output_file, 'a' if start > 0 else 'w') as out:
+            self.stream_relations(seed_matches, out)
+            seed_matches = self.run_bootstrapping(emo_list, seed_matches, tweets.tweets_by_idx)
+            self.print_emo_causes(seed_matches, out)
+
+        if self.incremental:
+            checkpoint.save(parsed_tweet_file, end, tweets.corpus.next_tweet)
+
+    def score_batch(self, parsed_tweet_file, out):
+        """
+        Score a file of parsed tweets against the test seeds, keeping nothing of it afterwards
+        :param parsed_tweet_file: the TweeboParser output file
+        :param out: text file object to write the relations to
+        :return: the number of relations found
+        """
+        tweets = BECRTweetLoader(parsed_tweet_file, use_cache=False)
+        emo_list = self.get_emo_list(tweets)
+        self.load_models()
+        self.predicted_relations = []
+        self.stream_relations(self.test_seeds, out)
+        relations = self.run_bootstrapping(emo_list, self.test_seeds, tweets.tweets_by_idx)
+        self.print_emo_causes(relations, out)
+        return len(relations)
+
+    def get_emo_list(self, tweets):
+        """
+        Load tweets and extract their candidate emotion cause pairs
+        :param tweets: BECRTweetLoader
+        :return: list of emotion cause pairs
+        """
+        tweets.extract_emo_relations()
+        extractor = BECREmotionCauseRuleExtractor()
+        return extractor.build_emo_cause_list(tweets.tweet2emo, tweets.idx2tweet)
+
+    def load_models(self):
+        """
+        Load the GLoVe embeddings, and the test seeds in the test phase, unless they are already loaded
+        :return: void
+        """
+        if Seed.glove_matrix is None:
+            Seed.load_glove_embeddings(self.glove_size)
+        if self.is_test and self.test_seeds is None:
+            self.test_seeds = self.load_test_seeds()
+
+    def load_test_seeds(self):
+        """
+        Load the seed model written in training
+        :return: SeedModel
+        """
+        if not os.path.exists(self.TEST_SEEDS_FILE):
+            # seed lists pickled by earlier versions hold objects of classes that have since changed
+            raise FileNotFoundError("no seed model " + self.TEST_SEEDS_FILE + "; run training to write it, as a "
+                                    "test_seeds.pkl of earlier versions cannot be read")
+        return SeedModel.load(self.TEST_SEEDS_FILE)
 
     def get_seed_matches(self, emo_list, tweet_objects):
         """
         Set up list of seeds to search for in twitter preprocessed outputs;
         Seeds must be exact string matches for emotion and cause pair relations
         :param emo_list: list of emotion cause pairs
-        :param tweet_objects: list of Tweet objects from file
+        :param tweet_objects: dict of tweet index to Tweet object from file
         :return: list of Seed objects
         """
 
-        # negative seed pairs can be added here
-        neg_seed_pairs = {}
-
+        neg_seed_pairs = self.neg_seed_pairs
         seed_matches = []
         for ex in emo_list:
 
@@ -129,32 +291,35 @@ class RuleBootstrapper:
         """
         Find new relations from candidate seeds
         :param candidate_seeds: list of candidate Seed objects
-        :param seed_matches: list of matching Seed objects
+        :param seed_matches: list of matching Seed objects, or the SeedModel in the test phase
         :param tau: tau value
         :param cycle: cycle value
-        :return: void
+        :return: list of the new seed matches and bad seeds
         """
+        # Seeds that are already a match or a bad seed are skipped
+        open_seeds = [c for c in candidate_seeds if not (c.emotion.seed or c.emotion.bad_seed)]
+
+        # Seed matches are only ever appended, and a candidate's best score and bad status against the ones it was
+        # compared with in earlier cycles are cached, so it is only compared with the seed matches added since
+        compared = min([c.compared for c in open_seeds], default=len(seed_matches))
+        if self.is_test:
+            seeds = seed_matches.matrix[compared:]
+        else:
+            seeds = ContextMatrix.from_seeds(seed_matches[compared:], self.glove_size)
+        scores = self.score_candidates(open_seeds, seeds, tau, compared)
+
         new_seeds = []
-        for candidate_seed in candidate_seeds:
+        for candidate_seed, (bad, max_cosine) in zip(open_seeds, scores):
 
-            # If this seed is already a match or a bad seed, skip it
+            # Candidates can share an emotion word, which an earlier candidate of this cycle may have taken
             if candidate_seed.emotion.seed or candidate_seed.emotion.bad_seed:
                 continue
 
-            max_cosine = 0
-
-            for seed in seed_matches:
-                if candidate_seed.bad:
-                    continue
-
-                if seed.bad:
-                    cos_sim = self.cosine_sim(seed, candidate_seed, self.neg_alpha, self.neg_beta, self.neg_gamma, self.neg_delta, self.neg_epsilon)
-                    if cos_sim > self.neg_tau:
-                        candidate_seed.bad = True
-                else:
-                    cos_sim = self.cosine_sim(seed, candidate_seed, self.alpha, self.beta, self.gamma, self.delta, self.epsilon)
-                    if cos_sim > tau:
-                        max_cosine = cos_sim if cos_sim > max_cosine else max_cosine
+            if bad:
+                candidate_seed.bad = True
+            max_cosine = max_cosine if max_cosine > candidate_seed.max_cosine else candidate_seed.max_cosine
+            candidate_seed.max_cosine = max_cosine
+            candidate_seed.compared = len(seed_matches)
 
             if max_cosine > 0 and not candidate_seed.bad:
                 new_seeds.append(candidate_seed)
@@ -174,6 +339,201 @@ class RuleBootstrapper:
         else:
             seed_matches.extend(new_seeds)
 
+        self.write_accepted(new_seeds)
+        return new_seeds
+
+    def score_candidates(self, candidate_seeds, seeds, tau, compared):
+        """
+        Score candidate seeds against all seed matches
+        :param candidate_seeds: list of candidate Seed objects
+        :param seeds: ContextMatrix of the seed matches
+        :param tau: tau value
+        :param compared: the index of the first of the seed matches among all of them
+        :return: list of (bad, max_cosine) tuples, one per candidate
+        """
+        def get_block(start, end):
+            return ContextMatrix.from_seeds(candidate_seeds[start:end], self.glove_size)
+        return [score for _, _, scores in self.score_blocks(len(candidate_seeds), get_block, seeds, tau,
+                                                                        compared)
+                for score in scores]
+
+    def score_blocks(self, count, get_block, seeds, tau, compared):
+        """
+        Score candidates against all seed matches a block at a time, so only the blocks being scored are held as
+        matrices. A block is a chunk of candidates, or a chunk per worker in a process pool if there are workers and
+        at least SCORE_CHUNK candidates for each
+        :param count: the number of candidates
+        :param get_block: function of a start and end candidate to the ContextMatrix of those candidates
+        :param seeds: ContextMatrix of the seed matches
+        :param tau: tau value
+        :param compared: the index of the first of the seed matches among all of them
+        :return: generator of the start and end of each block with the list of (bad, max_cosine) tuples of its
+        candidates
+        """
+        if not count:
+            return
+
+        chunk = self.get_chunk_size(seeds)
+        patterns = self.get_patterns(seeds, compared)
+        if self.workers > 1 and count >= self.workers * self.SCORE_CHUNK:
+            yield from self.score_in_pool(count, get_block, seeds, tau, chunk, patterns)
+            return
+
+        for start in range(0, count, chunk):
+            end = min(start + chunk, count)
+            candidates = get_block(start, end)
+            yield start, end, self.score_rows(candidates, seeds, tau, patterns, 0, len(candidates))
+
+    def get_chunk_size(self, seeds):
+        """
+        Get the number of candidates to score at once, so that the seed matches and the chunks all processes score at
+        the same time fit the memory budget
+        :param seeds: ContextMatrix of the seed matches
+        :return: int
+        """
+        # the vectors and normalized vectors of a candidate, and its similarities with the seeds and their temporaries
+        row_bytes = 8 * (2 * len(ContextMatrix.COMPONENTS) * self.glove_size + 3 * len(seeds))
+        # the processes share the seed matches, so they count once
+        budget = int(self.memory_budget * 2 ** 20) - seeds.nbytes
+        return max(1, budget // self.workers // row_bytes)
+
+    def get_patterns(self, seeds, compared):
+        """
+        Get the patterns of the seed matches a cycle compares candidates with, if there is a pattern_tau. In training,
+        the seed matches added since the last cycle join the patterns kept for the run
+        :param seeds: ContextMatrix of the seed matches
+        :param compared: the index of the first of them among all seed matches
+        :return: SeedPatterns of the bad and of the good seeds, or None
+        """
+        if self.pattern_tau is None:
+            return None
+        if self.is_test:
+            if self.test_patterns is None:
+                self.test_patterns = self.get_model_patterns(self.test_seeds)
+            patterns = self.test_patterns
+        else:
+            if self.seed_patterns is None:
+                self.seed_patterns = self.new_patterns()
+            patterns = [p.add(seeds, compared) for p in self.seed_patterns]
+        return tuple(p.select(compared) for p in patterns)
+
+    def new_patterns(self):
+        """
+        Start patterns of the bad and of the good seed matches
+        :return: SeedPatterns of the bad and of the good seeds
+        """
+        weights = (self.alpha, self.beta, self.gamma, self.epsilon, self.delta)
+        neg_weights = (self.neg_alpha, self.neg_beta, self.neg_gamma, self.neg_epsilon, self.neg_delta)
+        return SeedPatterns(True, neg_weights, self.pattern_tau), SeedPatterns(False, weights, self.pattern_tau)
+
+    def get_model_patterns(self, model):
+        """
+        Get the patterns of the test seeds: those saved with the model if they were clustered with this pattern_tau,
+        or else patterns clustered once for all the files this bootstrapper scores
+        :param model: SeedModel
+        :return: SeedPatterns of the bad and of the good seeds
+        """
+        if model.patterns is not None and all(p.pattern_tau == self.pattern_tau for p in model.patterns):
+            return model.patterns
+        return tuple(p.add(model.matrix) for p in self.new_patterns())
+
+    def score_in_pool(self, count, get_block, seeds, tau, chunk, patterns):
+        """
+        Score candidates in worker processes, a chunk per worker at a time. The seed matrices and patterns are written
+        to memory-mapped files that each worker opens once, and each block of candidates to a file the workers share,
+        so only file names and ranges are sent with the tasks. The chunks are joined back in order, so the scores are
+        the same as in one process
+        :param count: the number of candidates
+        :param get_block: function of a start and end candidate to the ContextMatrix of those candidates
+        :param seeds: ContextMatrix of the seed matches
+        :param tau: tau value
+        :param chunk: the number of candidates a worker scores at once
+        :param patterns: SeedPatterns of the bad and of the good seeds, or None
+        :return: generator of the start and end of each block with the list of (bad, max_cosine) tuples of its
+        candidates
+        """
+        with tempfile.TemporaryDirectory(dir=self.SHARED_DIR if os.path.isdir(self.SHARED_DIR) else None) as tmp_dir:
+            candidate_file = os.path.join(tmp_dir, 'candidates')
+            seed_file = os.path.join(tmp_dir, 'seeds')
+            seeds.save(seed_file)
+            pattern_file = None
+            if patterns is not None:
+                pattern_file = os.path.join(tmp_dir, 'patterns')
+                SeedPatterns.save_pair(patterns, pattern_file)
+
+            block = chunk * self.workers
+            with Pool(self.workers, initializer=init_scorer, initargs=(self, seed_file, pattern_file, tau)) as pool:
+                for block_start in range(0, count, block):
+                    block_end = min(block_start + block, count)
+                    # the file is replaced rather than overwritten, so workers still reading the last block are safe
+                    candidates = get_block(block_start, block_end)
+                    candidates.save(candidate_file)
+                    ranges = [(candidate_file, start, min(start + chunk, len(candidates)))
+                              for start in range(0, len(candidates), chunk)]
+                    yield block_start, block_end, [score for part in pool.map(score_range, ranges) for score in part]
+
+    def score_rows(self, candidates, seeds, tau, patterns, start, end):
+        """
+        Score a range of candidates against all seed matches
+        A candidate is bad if its similarity with a bad seed is above neg_tau; otherwise its score is the highest
+        similarity with a good seed that is above tau, or 0 if there is none. Bad seeds veto candidates in one matrix
+        pass first, and only the candidates left are scored against the good seeds. Each pass stops summing the
+        components of candidates and seeds that can no longer get above its threshold. With patterns, candidates are
+        only compared with the seeds of patterns they may be close to. All of these give the same scores
+        :param candidates: ContextMatrix of the candidate seeds
+        :param seeds: ContextMatrix of the seed matches
+        :param tau: tau value
+        :param patterns: SeedPatterns of the bad and of the good seeds, or None
+        :param start: first candidate of the range
+        :param end: end of the range
+        :return: list of (bad, max_cosine) tuples, one per candidate of the range
+        """
+        bad_columns = np.flatnonzero(seeds.bad)
+        good_columns = np.flatnonzero(~seeds.bad)
+        weights = (self.alpha, self.beta, self.gamma, self.epsilon, self.delta)
+        neg_weights = (self.neg_alpha, self.neg_beta, self.neg_gamma, self.neg_epsilon, self.neg_delta)
+        rows = np.arange(start, end)
+
+        bad = candidates.bad[rows].copy()
+        checked = np.flatnonzero(~bad)
+        if len(bad_columns) and len(checked):
+            if patterns is not None:
+                neg_sims = patterns[0].weighted_sim(candidates, seeds, neg_weights, rows[checked],
+                                                    self.neg_tau - self.EXACT_MARGIN)
+            else:
+                neg_sims = candidates.weighted_sim(seeds, neg_weights, rows[checked], bad_columns,
+                                                   self.neg_tau - self.EXACT_MARGIN)
+            # similarities this far above neg_tau stay above it after rounding; only those near it are rescored
+            bad[checked] = (neg_sims > self.neg_tau + self.EXACT_MARGIN).any(axis=1)
+            near = ~bad[checked] & (neg_sims > self.neg_tau - self.EXACT_MARGIN).any(axis=1)
+            for row in np.flatnonzero(near):
+                candidate_seed = candidates.row(rows[checked[row]])
+                columns = bad_columns[neg_sims[row] > self.neg_tau - self.EXACT_MARGIN]
+                bad[checked[row]] = any(self.cosine_sim(seeds.row(column), candidate_seed, self.neg_alpha,
+                                                        self.neg_beta, self.neg_gamma, self.neg_delta,
+                                                        self.neg_epsilon) > self.neg_tau for column in columns)
+
+        max_cosines = [0] * len(rows)
+        kept = np.flatnonzero(~bad)
+        if len(good_columns) and len(kept):
+            if patterns is not None:
+                sims = patterns[1].weighted_sim(candidates, seeds, weights, rows[kept], tau - self.EXACT_MARGIN)
+            else:
+                sims = candidates.weighted_sim(seeds, weights, rows[kept], good_columns, tau - self.EXACT_MARGIN)
+            for row in np.flatnonzero((sims > tau - self.EXACT_MARGIN).any(axis=1)):
+                candidate_seed = candidates.row(rows[kept[row]])
+                above = sims[row] > tau - self.EXACT_MARGIN
+                # only seeds that can still be the best after rounding are rescored
+                top = sims[row][above].max()
+                max_cosine = 0
+                for column in good_columns[above & (sims[row] > top - 2 * self.EXACT_MARGIN)]:
+                    cos_sim = self.cosine_sim(seeds.row(column), candidate_seed, self.alpha, self.beta,
+                                              self.gamma, self.delta, self.epsilon)
+                    if cos_sim > tau:
+                        max_cosine = cos_sim if cos_sim > max_cosine else max_cosine
+                max_cosines[kept[row]] = max_cosine
+        return [(bool(b), max_cosine) for b, max_cosine in zip(bad, max_cosines)]
+
     def set_all_contexts(self, emo_list, tweet_objects):
         """
         Initialize all seed contexts - before, between and after
@@ -181,56 +541,253 @@ class RuleBootstrapper:
         :param tweet_objects: Tweet objects
         :return: list of candidate Seed objects
         """
-        candidate_seeds = []
-        for example in emo_list:
-            emo = example[0]
-            if emo.seed or emo.bad_seed:
-                continue
+        examples = [example for example in emo_list if not (example[0].seed or example[0].bad_seed)]
+        candidate_seeds = [None] * len(examples)
+        for i, candidate_seed in self.embed_candidates(examples, tweet_objects):
+            candidate_seeds[i] = candidate_seed
 
-            cause = example[1]
-            candidate_seed = Seed(emo, cause, tweet_objects[emo.tweet_idx], self.glove_size)
+        return candidate_seeds
+
+    def embed_candidates(self, examples, tweet_objects):
+        """
+        Build the candidate Seed objects of emotion cause examples with their contexts, a tweet at a time, so the
+        candidates of a tweet share the prefix sums of its token vectors, which are dropped once they are embedded
+        :param examples: list of emotion cause examples
+        :param tweet_objects: dict of tweet index to Tweet object
+        :return: generator of the index of the example and its candidate Seed object, in tweet order
+        """
+        tweet = None
+        for i in sorted(range(len(examples)), key=lambda i: examples[i][0].tweet_idx):
+            emo, cause = examples[i][0], examples[i][1]
+            if tweet is not None and tweet is not tweet_objects[emo.tweet_idx]:
+                tweet.prefix_embeddings = None
+            tweet = tweet_objects[emo.tweet_idx]
+            candidate_seed = Seed(emo, cause, tweet, self.glove_size)
             self.get_seed_contexts(candidate_seed, emo, cause)
             emo.seed = False  # initialize to False
-            candidate_seeds.append(candidate_seed)
+            yield i, candidate_seed
+        if tweet is not None:
+            tweet.prefix_embeddings = None
 
-        return candidate_seeds
+    def store_all_contexts(self, emo_list, tweet_objects, directory):
+        """
+        Initialize all seed contexts as set_all_contexts does, writing the candidates to a store instead of
+        keeping their Seed objects
+        :param emo_list: list of Word objects set True for emotion
+        :param tweet_objects: Tweet objects
+        :param directory: the directory to write the store to
+        :return: CandidateStore, and the list of emotion cause examples its rows refer to
+        """
+        examples = [example for example in emo_list if not (example[0].seed or example[0].bad_seed)]
+        store = CandidateStore(directory, len(examples), self.glove_size, Seed.dtype)
+
+        groups = {}
+        for i, candidate_seed in self.embed_candidates(examples, tweet_objects):
+            store.set_row(i, candidate_seed, i, groups.setdefault(id(candidate_seed.emotion), len(groups)))
+        store.close(len(groups))
+        return store, examples
+
+    def find_stored_relations(self, store, examples, tweet_objects, seed_matches, tau, cycle):
+        """
+        Find new relations from the candidates of a store, as find_new_relations does from Seed objects
+        :param store: CandidateStore
+        :param examples: the emotion cause examples of the store rows
+        :param tweet_objects: Tweet objects
+        :param seed_matches: list of matching Seed objects, or the SeedModel in the test phase
+        :param tau: tau value
+        :param cycle: cycle value
+        :return: list of the new seed matches and bad seeds
+        """
+        open_rows = store.get_open()
+        compared = int(store.compared[open_rows].min()) if len(open_rows) else len(seed_matches)
+        if self.is_test:
+            seeds = seed_matches.matrix[compared:]
+        else:
+            seeds = ContextMatrix.from_seeds(seed_matches[compared:], self.glove_size)
+
+        new_seeds = []
+        for start, end, scores in self.score_blocks(len(open_rows), lambda a, b: store.get_matrix(open_rows[a:b]),
+                                                    seeds, tau, compared):
+            for row in store.decide(open_rows[start:end], scores, len(seed_matches), cycle):
+                new_seeds.append(self.get_stored_seed(store, row, examples, tweet_objects))
+
+        if self.is_test:
+            self.predicted_relations.extend(new_seeds)
+
+        else:
+            seed_matches.extend(new_seeds)
+
+        self.write_accepted(new_seeds)
+        return new_seeds
+
+    def get_stored_seed(self, store, row, examples, tweet_objects):
+        """
+        Rebuild the Seed object of a stored candidate that became a seed or bad seed
+        :param store: CandidateStore
+        :param row: index of the candidate
+        :param examples: the emotion cause examples of the store rows
+        :param tweet_objects: Tweet objects
+        :return: Seed
+        """
+        emo, cause = examples[store.example[row]][0], examples[store.example[row]][1]
+        seed = Seed(emo, cause, tweet_objects[emo.tweet_idx], self.glove_size)
+        for vectors, name in zip(store.vectors, ContextMatrix.COMPONENTS):
+            setattr(seed, name, np.array(vectors[row]))
+        seed.bad = bool(store.bad[row])
+        seed.cosine = 0 if seed.bad else float(store.cosine[row])
+        seed.cycle = int(store.cycle[row])
+        if seed.bad:
+            emo.bad_seed = True
+        else:
+            emo.seed = True
+        return seed
 
     def run_bootstrapping(self, emo_list, seed_matches, tweet_objects):
         """
         Run bootstrapping to get new seed matches
         :param emo_list: list of emotion, cause pairs
-        :param seed_matches: list of Seed object matches
-        :param tweet_objects: list of Tweet objects
+        :param seed_matches: list of Seed object matches, or the SeedModel in the test phase
+        :param tweet_objects: dict of tweet index to Tweet object
         :return: updated list of Seed object matches
         """
+        if self.candidate_store:
+            with tempfile.TemporaryDirectory(dir=self.candidate_store) as directory:
+                store, examples = self.store_all_contexts(emo_list, tweet_objects, directory)
+                return self.run_cycles(
+                    lambda tau, cycle: self.find_stored_relations(store, examples, tweet_objects, seed_matches, tau,
+                                                                  cycle),
+                    lambda: len(store.get_open()), seed_matches)
+
         candidates = self.set_all_contexts(emo_list, tweet_objects)
+        return self.run_cycles(lambda tau, cycle: self.find_new_relations(candidates, seed_matches, tau, cycle),
+                               lambda: sum(1 for c in candidates if not (c.emotion.seed or c.emotion.bad_seed)),
+                               seed_matches)
 
+    def run_cycles(self, find_relations, count_remaining, seed_matches):
+        """
+        Run the bootstrapping cycles over a source of candidates, kept as Seed objects or in a store
+        :param find_relations: function of tau and the cycle value that finds the new relations of a cycle
+        :param count_remaining: function that counts the candidates not yet taken as seeds or bad seeds
+        :param seed_matches: list of Seed object matches, or the SeedModel in the test phase
+        :return: updated list of Seed object matches
+        """
         # run one cycle in test phase
         if self.is_test:
-            self.find_new_relations(candidates, seed_matches, self.tau, 0)
+            find_relations(self.tau, 0)
             return self.predicted_relations
 
         for i in range(self.cycles):
-            self.find_new_relations(candidates, seed_matches, self.tau, i + 1)
+            start = time.perf_counter()
+            new_seeds = find_relations(self.tau, i + 1)
+            remaining = count_remaining()
+            sys.stderr.write("cycle {}: {} seeds added, {} candidates remaining, {:.2f}s\n".format(
+                i + 1, len(new_seeds), remaining, time.perf_counter() - start))
+
+            # later cycles only compare candidates with the seeds added since, so with none added nothing can change
+            if len(new_seeds) < self.min_new_seeds or not remaining:
+                break
         return seed_matches
 
-    def print_emo_causes(self, seed_matches, output):
+    def stream_relations(self, seed_matches, out):
+        """
+        In stream mode, have bootstrapping write relations to the output file as it accepts them, starting with the
+        initial seed matches in training; otherwise relations are written once bootstrapping is done
+        :param seed_matches: list of initial Seed object matches, or the SeedModel in the test phase
+        :param out: text file object
+        :return: void
+        """
+        self.relation_out = out if self.stream else None
+        if not self.is_test:
+            self.write_accepted(seed_matches)
+
+    def write_accepted(self, new_seeds):
+        """
+        Write the relations bootstrapping just accepted, in stream mode
+        :param new_seeds: list of the new seed matches and bad seeds
+        :return: void
+        """
+        if self.relation_out is None:
+            return
+        for seed in new_seeds:
+            self.write_relation(seed, self.relation_out)
+        self.relation_out.flush()
+
+    def print_emo_causes(self, seed_matches, out):
         """
-        Write out the extracted emotion cause relations
+        Write out the extracted emotion cause relations, unless they were streamed, and in training save the
+        seed model
         :param seed_matches: list of Seed object matches
-        :param output: the output file name
+        :param out: text file object
         :return: void
         """
         if not self.is_test:
-            pickle.dump(seed_matches, open('../../lib/seeds/test_seeds.pkl', 'wb'))
+            model = SeedModel.from_seeds(seed_matches, self.glove_size)
+            # the seed matches of the last cycle join the patterns of the run, which the test phase reuses
+            if self.seed_patterns is not None:
+                model.patterns = tuple(p.add(model.matrix) for p in self.seed_patterns)
+            model.save(self.TEST_SEEDS_FILE)
+
+        if self.relation_out is None:
+            self.write_relations(seed_matches, out)
+        self.relation_out = None
+
+    def write_relations(self, seed_matches, out):
+        """
+        Write emotion cause relations, highest scores first; with top_k, only that many, picked with a bounded heap
+        instead of sorting them all. Relations with equal scores keep their order either way
+        :param seed_matches: list of Seed object matches
+        :param out: text file object
+        :return: void
+        """
+        if self.top_k is not None:
+            relations = heapq.nlargest(self.top_k, seed_matches, key=lambda x: x.cosine)
+        else:
+            relations = sorted(seed_matches, key=lambda x: -x.cosine)
+        for seed in relations:
+            self.write_relation(seed, out)
+
+    @staticmethod
+    def write_relation(seed, out):
+        """
+        Write one emotion cause relation with its score
+        :param seed: Seed object
+        :param out: text file object
+        :return: void
+        """
+        emo_text = " ".join([s.text for s in seed.emotion.phrase])
+        cause_text = " ".join([d.text for d in seed.cause])
+        relation = "EMOTION: " + emo_text + "\tCAUSE: " + cause_text + "\tTWEET:" + seed.tweet.raw
+        print(str(seed.cosine) + " " + relation, file=out)
+        print("", file=out)
+
+
+# the bootstrapper settings, seed matrices, patterns and tau a scoring worker process scores against
+scorer = None
+
+
+def init_scorer(bootstrapper, seed_file, pattern_file, tau):
+    """
+    Set up a scoring worker process once, with what every range it scores shares
+    :param bootstrapper: RuleBootstrapper, pickled with its scoring settings only
+    :param seed_file: the file of the seed matrices
+    :param pattern_file: the file of the seed patterns, or None
+    :param tau: tau value
+    :return: void
+    """
+    global scorer
+    patterns = SeedPatterns.load_pair(pattern_file) if pattern_file else None
+    scorer = bootstrapper, ContextMatrix.load(seed_file), patterns, tau
 
-        with open(output, 'w') as out:
-            for seed in sorted(seed_matches, key=lambda x: -x.cosine):
-                emo_text = " ".join([s.text for s in seed.emotion.phrase])
-                cause_text = " ".join([d.text for d in seed.cause])
-                relation = "EMOTION: " + emo_text + "\tCAUSE: " + cause_text + "\tTWEET:" + seed.tweet.raw
-                print(str(seed.cosine) + " " + relation, file=out)
-                print("", file=out)
+
+def score_range(score_args):
+    """
+    Score a range of candidates from a memory-mapped matrix; run in a worker process set up by init_scorer
+    :param score_args: candidate matrix file, and the start and end of the range
+    :return: list of (bad, max_cosine) tuples, one per candidate of the range
+    """
+    candidate_file, start, end = score_args
+    bootstrapper, seeds, patterns, tau = scorer
+    return bootstrapper.score_rows(ContextMatrix.load(candidate_file), seeds, tau, patterns, start, end)
 
 
 def parse_args(args):
@@ -240,15 +797,19 @@ def parse_args(args):
     :return: list of arguments
     """
     parser = argparse.ArgumentParser()
-    parser.add_argument('parsed_tweet_file')
-    parser.add_argument('output_file')
+    parser.add_argument('parsed_tweet_file', nargs='?')
+    parser.add_argument('output_file', nargs='?')
+    # file of "parsed_tweet_file output_file" lines to process in one process, or - to read them from stdin
+    parser.add_argument('--file_list')
     parser.add_argument('--glove_size', choices=[25, 50, 100], default=25)
     # confidence threshold
     parser.add_argument('--tau', type=float, default=0.8)
     # confidence threshold for negative seeds
     parser.add_argument('--neg_tau', type=float, default=0.9)
     # number of iterations
-    parser.add_argument('--cycles', type=float, default=10)
+    parser.add_argument('--cycles', type=int, default=10)
+    # stop before the number of iterations when an iteration adds fewer seeds than this
+    parser.add_argument('--min_new_seeds', type=int, default=1)
     # before context weight
     parser.add_argument('--alpha', type=float, default=0.2)
     # between context weight
@@ -268,7 +829,75 @@ def parse_args(args):
     # For bad seeds, the verb itself is often the best information
     parser.add_argument('--neg_epsilon', type=float, default=0.5)
     parser.add_argument('--test', action='store_true')
-    return parser.parse_args(args)
+    # emotion cause pairs that are bad seeds in training, in the format of train_seeds.txt or train_seeds.pkl
+    parser.add_argument('--neg_seeds')
+    # parse the input from scratch instead of using its binary parse cache
+    parser.add_argument('--no_cache', action='store_true')
+    # number of processes to shard loading of the input and scoring of candidates across
+    parser.add_argument('--workers', type=int, default=1)
+    # in test mode, only score tweets appended to the input since the last incremental run
+    parser.add_argument('--incremental', action='store_true')
+    # cluster seed matches into patterns whose members are at least this similar to the pattern centroid, and only
+    # compare candidates with the members of patterns that can hold a close enough seed
+    parser.add_argument('--pattern_tau', type=float)
+    # store context vectors in float32, which halves their memory; scores change by rounding only
+    parser.add_argument('--float32', action='store_true')
+    # megabytes of candidate and similarity matrices to hold at once while scoring, across all processes
+    parser.add_argument('--memory_budget', type=float, default=256)
+    # directory on local disk to keep the candidate vectors and bookkeeping in instead of memory
+    parser.add_argument('--candidate_store')
+    # JSON file of parameter value lists; writes one JSON line per combination to the output file instead of relations
+    parser.add_argument('--sweep')
+    # in test mode, keep the models loaded and score CoNLL batches sent to this Unix socket, or stdin for -
+    parser.add_argument('--serve')
+    # the number of batches that can wait to be scored before more are refused
+    parser.add_argument('--queue_size', type=int, default=16)
+    # only write this many relations, the highest scoring
+    parser.add_argument('--top_k', type=int)
+    # write relations unsorted as bootstrapping accepts them instead of sorted at the end
+    parser.add_argument('--stream', action='store_true')
+    parsed_args = parser.parse_args(args)
+    if parsed_args.incremental and not parsed_args.test:
+        parser.error('--incremental requires --test')
+    if parsed_args.incremental and parsed_args.sweep:
+        parser.error('--incremental cannot be combined with --sweep')
+    if parsed_args.file_list and not parsed_args.test:
+        parser.error('--file_list requires --test')
+    if parsed_args.serve and not parsed_args.test:
+        parser.error('--serve requires --test')
+    if parsed_args.queue_size < 1:
+        parser.error('--queue_size must be at least 1')
+    if parsed_args.top_k is not None and parsed_args.top_k < 1:
+        parser.error('--top_k must be at least 1')
+    if parsed_args.top_k is not None and parsed_args.stream:
+        parser.error('--top_k cannot be combined with --stream')
+    if not parsed_args.output_file and not parsed_args.file_list and not parsed_args.serve:
+        parser.error('give a parsed_tweet_file and output_file, or --file_list')
+    return parsed_args
+
+
+def get_file_pairs(args):
+    """
+    Get the input and output files to process, reading a file list lazily so it can be a queue on stdin.
+    The files of a list line are separated by a tab, so paths can hold spaces, or else by whitespace;
+    malformed lines are reported and skipped
+    :param args: parsed arguments
+    :return: generator of parsed tweet file and output file pairs
+    """
+    if args.parsed_tweet_file:
+        yield args.parsed_tweet_file, args.output_file
+
+    if args.file_list:
+        file_list = sys.stdin if args.file_list == '-' else open(args.file_list, 'r')
+        for line in file_list:
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            files = line.split('\t') if '\t' in line else line.split()
+            if len(files) != 2 or not all(files):
+                sys.stderr.write("skipping malformed file list line: " + line + "\n")
+                continue
+            yield files[0], files[1]
 
 
 def main():
@@ -278,23 +907,21 @@ def main():
     :return: void
     """
     args = parse_args(sys.argv[1:])
-
-    tweets = BECRTweetLoader(args.parsed_tweet_file)
-    tweets.extract_emo_relations()
-    extractor = BECREmotionCauseRuleExtractor()
-    emo_list = extractor.build_emo_cause_list(tweets.tweet2emo, tweets.idx2tweet)
-
-    Seed.load_glove_embeddings(args.glove_size)
     bootstrapper = RuleBootstrapper(args)
-
-    if not args.test:
-        seed_matches = bootstrapper.get_seed_matches(emo_list, tweets.tweet_list)
-    else:
-        # this pickle file is a list of Seed objects
-        seed_matches = pickle.load(open('../../lib/seeds/test_seeds.pkl', "rb"))
-
-    seed_matches = bootstrapper.run_bootstrapping(emo_list, seed_matches, tweets.tweet_list)
-    bootstrapper.print_emo_causes(seed_matches, args.output_file)
+    if args.serve:
+        batch_dir = RuleBootstrapper.SHARED_DIR if os.path.isdir(RuleBootstrapper.SHARED_DIR) else None
+        ScoringService(bootstrapper, args.queue_size, batch_dir).serve(args.serve)
+        return
+    failed = 0
+    for parsed_tweet_file, output_file in get_file_pairs(args):
+        # one bad file must not end a worker consuming a queue of them
+        try:
+            bootstrapper.process_file(parsed_tweet_file, output_file)
+        except Exception as e:
+            failed += 1
+            sys.stderr.write("failed to process " + parsed_tweet_file + ": " + repr(e) + "\n")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+"""
+Candidate seed vectors and bookkeeping kept in memory-mapped files on disk
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import numpy as np
+from src.BECR.context_matrix import ContextMatrix
+
+
+class CandidateStore:
+    """
+    Holds the context vectors of the candidate seeds and what bootstrapping tracks about them in .npy files that are
+    memory-mapped, so the candidates of a corpus need not fit in memory. Rows are in candidate order, and
+    bootstrapping cycles read them a block at a time from the start, so the files are read sequentially.
+    Besides the vectors, each candidate has the index of its emotion cause example, which rebuilds its Seed object,
+    the group of candidates that share its emotion word, and its bad flag, the number of seed matches it was compared
+    with, its best score against them, and the cycle and score it was taken as a seed with. A group is taken once one of its candidates becomes a seed or bad seed
+    """
+
+    STATIC = (('example', np.int64), ('group', np.int64))
+    STATE = (('bad', np.bool_), ('compared', np.int64), ('max_cosine', np.float64), ('cosine', np.float64),
+             ('cycle', np.int32))
+
+    def __init__(self, directory, count, glove_size, dtype):
+        """
+        Create the files of a store
+        :param directory: the directory to write the files to
+        :param count: the number of candidates
+        :param glove_size: the size of the vectors
+        :param dtype: the type the vectors are stored in
+        """
+        self.directory = directory
+        self.count = count
+        self.vectors = [self.create(name, dtype, (count, glove_size)) for name in ContextMatrix.COMPONENTS]
+        for name, column_dtype in self.STATIC + self.STATE:
+            setattr(self, name, self.create(name, column_dtype, (count,)))
+        self.cycle[:] = -1
+        self.taken = None
+
+    def create(self, name, dtype, shape):
+        """
+        Create a zero-filled memory-mapped array file
+        :param name: the name of the array
+        :param dtype: its type
+        :param shape: its shape
+        :return: the mapped array
+        """
+        file_name = os.path.join(self.directory, name + '.npy')
+        return np.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=shape)
+
+    def __len__(self):
+        """
+        The number of candidates
+        :return: int
+        """
+        return self.count
+
+    def set_row(self, row, seed, example, group):
+        """
+        Write a candidate
+        :param row: index of the candidate
+        :param seed: Seed object of the candidate with its contexts set
+        :param example: index of its emotion cause example
+        :param group: index of its emotion word
+        :return: void
+        """
+        for vectors, name in zip(self.vectors, ContextMatrix.COMPONENTS):
+            vectors[row] = getattr(seed, name)
+        self.example[row] = example
+        self.group[row] = group
+
+    def close(self, groups):
+        """
+        Finish writing the candidates
+        :param groups: the number of emotion words
+        :return: void
+        """
+        for vectors in self.vectors:
+            vectors.flush()
+        self.taken = self.create('taken', np.bool_, (groups,))
+
+    def get_open(self):
+        """
+        Get the candidates whose emotion word has not been taken
+        :return: index array, in candidate order
+        """
+        return np.flatnonzero(~self.taken[self.group])
+
+    def get_matrix(self, rows):
+        """
+        Stack the vectors of some candidates in float64, as ContextMatrix.from_seeds does
+        :param rows: index array of the candidates, in increasing order
+        :return: ContextMatrix
+        """
+        return ContextMatrix([v[rows].astype(np.float64) for v in self.vectors], self.bad[rows])
+
+    def decide(self, rows, scores, seed_count, cycle):
+        """
+        Update candidates with their scores against the latest seed matches, as RuleBootstrapper.find_new_relations
+        does one candidate at a time: in candidate order, the first bad or matching candidate of an emotion word takes
+        it, and later candidates of a taken emotion word are skipped
+        :param rows: index array of the candidates, in increasing order
+        :param scores: list of (bad, max_cosine) tuples, one per candidate
+        :param seed_count: the number of seed matches the candidates have now been compared with
+        :param cycle: cycle value
+        :return: index array of the candidates that became seeds or bad seeds, in candidate order
+        """
+        bad = self.bad[rows] | np.array([score[0] for score in scores], dtype=bool)
+        max_cosine = np.maximum(self.max_cosine[rows], np.array([score[1] for score in scores], dtype=np.float64))
+        groups, inverse = np.unique(self.group[rows], return_inverse=True)
+        taken = self.taken[groups][inverse]
+        decided = ~taken & (bad | (max_cosine > 0))
+
+        positions = np.arange(len(rows))
+        first = np.full(len(groups), len(rows))
+        np.minimum.at(first, inverse[decided], positions[decided])
+        skipped = taken | (positions > first[inverse])
+        new = decided & (positions == first[inverse])
+
+        kept = rows[~skipped]
+        self.bad[kept] = bad[~skipped]
+        self.max_cosine[kept] = max_cosine[~skipped]
+        self.compared[kept] = seed_count
+
+        new_rows = rows[new]
+        self.taken[self.group[new_rows]] = True
+        self.cycle[new_rows] = cycle
+        self.cosine[new_rows] = np.where(bad[new], 0, max_cosine[new])
+        return new_rows
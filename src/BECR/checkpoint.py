@@ -0,0 +1,56 @@
+"""
+Checkpoint of how far incremental runs have read into a growing parse file
+"""
+import os
+import sys
+import json
+
+
+class IngestCheckpoint:
+    """
+    Records the byte offset and tweet index up to which a parse file has been scored,
+    stored next to the output file the relations are appended to
+    """
+
+    SUFFIX = '.checkpoint'
+
+    def __init__(self, output_file):
+        """
+        Initialize with the output file of the incremental runs
+        :param output_file: the output file name
+        """
+        self.checkpoint_file = output_file + self.SUFFIX
+
+    def load(self, parsed_tweet_file):
+        """
+        Get the position to resume reading the parse file from
+        :param parsed_tweet_file: the parse file
+        :return: byte offset and tweet index; zeros if the file has not been read yet
+        """
+        if not os.path.exists(self.checkpoint_file):
+            return 0, 0
+
+        with open(self.checkpoint_file, 'r') as f:
+            checkpoint = json.load(f)
+
+        if checkpoint['parsed_tweet_file'] != os.path.abspath(parsed_tweet_file) \
+                or checkpoint['offset'] > os.path.getsize(parsed_tweet_file):
+            sys.stderr.write("Checkpoint " + self.checkpoint_file + " does not match " + parsed_tweet_file +
+                             ", starting from the beginning\n")
+            return 0, 0
+
+        return checkpoint['offset'], checkpoint['tweet_idx']
+
+    def save(self, parsed_tweet_file, offset, tweet_idx):
+        """
+        Record the position the next run should resume from
+        :param parsed_tweet_file: the parse file
+        :param offset: byte offset after the last tweet read
+        :param tweet_idx: index of the next tweet
+        :return: void
+        """
+        checkpoint = {'parsed_tweet_file': os.path.abspath(parsed_tweet_file), 'offset': offset, 'tweet_idx': tweet_idx}
+        tmp_file = self.checkpoint_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_file, self.checkpoint_file)
@@ -0,0 +1,214 @@
+"""
+Stacked context vectors of many seeds, for scoring candidate seeds against seed matches in bulk
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import numpy as np
+from src.BECR.array_file import ArrayFile
+
+
+class ContextMatrix:
+    """
+    Holds the before, between and after context vectors and the emotion and cause embeddings of a list of
+    Seed objects as one matrix per component, plus a row-normalized copy of each, so the cosine similarities
+    of many seed pairs are a few matrix products instead of one scipy call per pair and component
+    """
+
+    # Seed attributes of the components, in the order of the weights passed to weighted_sim
+    COMPONENTS = ('bef', 'btwn', 'aft', 'emo_embedding', 'cause_embedding')
+    MAGIC = b'BECRCM'
+    # seeds of the other matrix pruned against together; in smaller blocks more rows run out of reachable seeds
+    PRUNE_BLOCK = 128
+
+    def __init__(self, vectors, bad, components=None):
+        """
+        Initialize with the stacked vectors
+        :param vectors: list of 2-d arrays, one per component with a row per seed
+        :param bad: boolean array marking the bad seeds
+        :param components: the row-normalized vectors, if they were already computed
+        """
+        self.vectors = vectors
+        self.bad = bad
+        self.components = components if components is not None else [self.normalize(v) for v in vectors]
+
+    @classmethod
+    def from_seeds(cls, seeds, glove_size):
+        """
+        Stack the vectors of the given seeds
+        :param seeds: list of Seed objects with their contexts set
+        :param glove_size: the size of the vectors
+        :return: ContextMatrix
+        """
+        vectors = []
+        for name in cls.COMPONENTS:
+            stacked = np.empty((len(seeds), glove_size))
+            for row, seed in enumerate(seeds):
+                stacked[row] = getattr(seed, name)
+            vectors.append(stacked)
+        return cls(vectors, np.array([bool(seed.bad) for seed in seeds], dtype=bool))
+
+    def __len__(self):
+        """
+        The number of seeds
+        :return: int
+        """
+        return len(self.bad)
+
+    @property
+    def nbytes(self):
+        """
+        The memory the matrices take
+        :return: int
+        """
+        return self.bad.nbytes + sum(v.nbytes for v in self.vectors) + sum(c.nbytes for c in self.components)
+
+    @staticmethod
+    def normalize(vectors):
+        """
+        Scale each row to unit length
+        :param vectors: 2-d array, one vector per row
+        :return: 2-d array
+        """
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / norms
+
+    def row(self, row):
+        """
+        Get the vectors of one seed, e.g. to score it exactly with RuleBootstrapper.cosine_sim
+        :param row: index of the seed
+        :return: ContextRow
+        """
+        return ContextRow(*[vectors[row] for vectors in self.vectors])
+
+    def weighted_sim(self, other, weights, rows, columns, threshold=None):
+        """
+        Weighted sum of the component cosine similarities of some of these seeds with some of the other's,
+        clipped to [-1, 1] like scipy.spatial.distance.cosine clips distances to [0, 2]
+        With a threshold, components are added heaviest weight first, and seeds of this matrix are dropped once
+        none of their similarities can get above the threshold with the weights left, as each cosine is at most 1.
+        The similarities of dropped seeds are left at their partial sums, which are at most the threshold
+        :param other: ContextMatrix
+        :param weights: weights of the components, in the order of COMPONENTS
+        :param rows: index or slice of the seeds of this matrix
+        :param columns: index or slice of the seeds of the other matrix
+        :param threshold: similarity below which pairs need not be summed in full, or None
+        :return: 2-d array with a row per seed of this matrix and a column per seed of the other
+        """
+        if threshold is not None:
+            return self.pruned_sim(other, weights, rows, columns, threshold)
+
+        sim = None
+        for weight, vectors, other_vectors in zip(weights, self.components, other.components):
+            # zero weights are common, e.g. the default neg_alpha, neg_beta and neg_gamma
+            if not weight:
+                continue
+            component_sim = weight * np.clip(vectors[rows] @ other_vectors[columns].T, -1, 1)
+            sim = component_sim if sim is None else sim + component_sim
+        if sim is None:
+            sim = np.zeros((len(self.bad[rows]), len(other.bad[columns])))
+        return sim
+
+    def pruned_sim(self, other, weights, rows, columns, threshold):
+        """
+        Weighted sum of the component cosine similarities, skipping what cannot get above the threshold;
+        see weighted_sim
+        :param other: ContextMatrix
+        :param weights: weights of the components, in the order of COMPONENTS
+        :param rows: index or slice of the seeds of this matrix
+        :param columns: index or slice of the seeds of the other matrix
+        :param threshold: similarity below which pairs need not be summed in full
+        :return: 2-d array with a row per seed of this matrix and a column per seed of the other
+        """
+        order = sorted([k for k, weight in enumerate(weights) if weight], key=lambda k: -abs(weights[k]))
+        remaining = [sum(abs(weights[j]) for j in order[i + 1:]) for i in range(len(order))]
+        own_components = [self.components[k][rows] for k in order]
+        other_components = [other.components[k][columns] for k in order]
+        sim = np.zeros((len(self.bad[rows]), len(other.bad[columns])))
+
+        for start in range(0, sim.shape[1], self.PRUNE_BLOCK):
+            block = slice(start, start + self.PRUNE_BLOCK)
+            # the sums of the rows still live are kept apart, and written back as rows are dropped
+            live, live_sim = None, None
+            for i, k in enumerate(order):
+                own = own_components[i] if live is None else own_components[i][live]
+                component_sim = np.clip(own @ other_components[i][block].T, -1, 1)
+                component_sim *= weights[k]
+                live_sim = component_sim if live_sim is None else np.add(live_sim, component_sim, out=live_sim)
+                if i + 1 < len(order):
+                    keep = (live_sim > threshold - remaining[i]).any(axis=1)
+                    if live is None:
+                        live = np.arange(len(sim))
+                    sim[live[~keep], block] = live_sim[~keep]
+                    live, live_sim = live[keep], live_sim[keep]
+                    if not len(live):
+                        break
+            if live_sim is not None:
+                sim[slice(None) if live is None else live, block] = live_sim
+        return sim
+
+    def __getitem__(self, rows):
+        """
+        Get the matrices of some of the seeds
+        :param rows: slice or index array of the seeds
+        :return: ContextMatrix
+        """
+        return ContextMatrix([v[rows] for v in self.vectors], self.bad[rows], [c[rows] for c in self.components])
+
+    def get_arrays(self):
+        """
+        The arrays to store the matrices in a file
+        :return: list of (name, array) pairs
+        """
+        arrays = [('bad', self.bad.astype(np.uint8))]
+        return arrays + [('vectors', v) for v in self.vectors] + [('components', c) for c in self.components]
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Build the matrices from arrays stored by get_arrays
+        :param arrays: dict of name to list of arrays
+        :return: ContextMatrix
+        """
+        return cls(arrays['vectors'], arrays['bad'][0].view(bool), arrays['components'])
+
+    def save(self, file_name):
+        """
+        Write the matrices to a file that load can memory-map
+        :param file_name: the output file
+        :return: void
+        """
+        ArrayFile(file_name, self.MAGIC).save(self.get_arrays())
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Memory-map matrices written by save, so processes reading the same file share its pages
+        :param file_name: the file
+        :return: ContextMatrix
+        """
+        arrays, _ = ArrayFile(file_name, cls.MAGIC).load()
+        return cls.from_arrays(arrays)
+
+
+class ContextRow:
+    """
+    The vectors of one seed of a ContextMatrix, with the attribute names of a Seed
+    """
+
+    __slots__ = ContextMatrix.COMPONENTS
+
+    def __init__(self, bef, btwn, aft, emo_embedding, cause_embedding):
+        """
+        Initialize with the component vectors
+        :param bef: before context vector
+        :param btwn: between context vector
+        :param aft: after context vector
+        :param emo_embedding: emotion embedding
+        :param cause_embedding: cause embedding
+        """
+        self.bef = bef
+        self.btwn = btwn
+        self.aft = aft
+        self.emo_embedding = emo_embedding
+        self.cause_embedding = cause_embedding
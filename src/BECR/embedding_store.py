@@ -0,0 +1,66 @@
+"""
+Binary GLoVe embedding store that is memory-mapped instead of unpickled
+"""
+import sys
+import os
+import numpy as np
+from src.BECR.array_file import ArrayFile
+
+
+class EmbeddingStore:
+    """
+    Stores GLoVe embeddings in one array file: a float32 matrix with the vector of word i in row i, the words
+    one per line, and a header with the number of words and the size of the vectors. Opening the store maps the
+    file read-only, so processes on one host share its pages instead of each holding a copy. The file is replaced
+    whole, so a reader never sees the words of one store with the vectors of another
+    """
+
+    SUFFIX = '.store'
+    MAGIC = b'BECRGV'
+    DTYPE = np.float32
+
+    def __init__(self, file_prefix):
+        """
+        Initialize with the path of the store file without its suffix
+        :param file_prefix: e.g. ../../lib/glove/glove25
+        """
+        self.file_name = file_prefix + self.SUFFIX
+
+    def exists(self):
+        """
+        Check that the store file is there
+        :return: bool
+        """
+        return os.path.exists(self.file_name)
+
+    def load(self, glove_size):
+        """
+        Read the words and memory-map the matrix
+        :param glove_size: the size the vectors must have
+        :return: dict of word to row, and the matrix, or None if there is no complete store with vectors of that size
+        """
+        try:
+            arrays, info = ArrayFile(self.file_name, self.MAGIC).load()
+            matrix, vocab = arrays['matrix'][0], arrays['vocab'][0]
+            rows, size = info['rows'], info['size']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        words = bytes(vocab).decode().split('\n') if len(vocab) else []
+        if size != glove_size or matrix.shape != (rows, size) or len(words) != rows:
+            return None
+        return {word: row for row, word in enumerate(words)}, matrix
+
+    def save(self, embeddings):
+        """
+        Write the store; failures only cost converting the embeddings again on the next run
+        :param embeddings: dict of word to vector
+        :return: void
+        """
+        matrix = np.array(list(embeddings.values()), dtype=self.DTYPE).reshape(len(embeddings), -1) \
+            if embeddings else np.zeros((0, 0), dtype=self.DTYPE)
+        vocab = np.frombuffer('\n'.join(embeddings).encode(), dtype=np.uint8)
+        try:
+            ArrayFile(self.file_name, self.MAGIC).save([('matrix', matrix), ('vocab', vocab)],
+                                                       {'rows': matrix.shape[0], 'size': matrix.shape[1]})
+        except OSError as e:
+            sys.stderr.write("Could not write embedding store " + self.file_name + ": " + str(e) + "\n")
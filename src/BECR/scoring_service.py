@@ -0,0 +1,204 @@
+"""
+Long-running test phase scoring of parsed tweet batches over a Unix socket or stdin
+"""
+import io
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import tempfile
+import threading
+import socketserver
+
+
+class ScoringRequest:
+    """
+    One batch waiting to be scored, and its result once it is
+    """
+
+    def __init__(self, batch_file, size):
+        """
+        Initialize with the batch
+        :param batch_file: file the batch was written to
+        :param size: the size of the batch in bytes
+        """
+        self.batch_file = batch_file
+        self.size = size
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.response = None
+        self.done = threading.Event()
+
+
+class ScoringService:
+    """
+    Keeps a test phase RuleBootstrapper with its GloVe embeddings and seed model loaded, and scores batches of
+    TweeboParser CoNLL output sent by clients. A client sends the lines of a batch followed by a BATCH_END line, or
+    closes its side of the connection, and gets back the relations in the format of the output file, a METRICS line
+    and a BATCH_END line; it may send any number of batches on one connection. Clients are served concurrently, but
+    batches are scored one at a time from a bounded queue, and a batch that finds the queue full is refused with an
+    ERROR line rather than left waiting
+    """
+
+    BATCH_END = b'#END'
+    METRICS = b'#METRICS '
+    ERROR = b'#ERROR '
+
+    def __init__(self, bootstrapper, queue_size=16, batch_dir=None):
+        """
+        Initialize with the bootstrapper that scores the batches
+        :param bootstrapper: RuleBootstrapper in test mode
+        :param queue_size: the number of batches that can wait to be scored
+        :param batch_dir: where batches are written for the tweet loader, or None for the default temporary directory
+        """
+        self.bootstrapper = bootstrapper
+        self.requests = queue.Queue(queue_size)
+        self.batch_dir = batch_dir
+        self.served = 0
+        self.scorer = threading.Thread(target=self.run_scorer, daemon=True)
+
+    def start(self):
+        """
+        Load the embeddings and seed model, then start scoring
+        :return: void
+        """
+        self.bootstrapper.load_models()
+        self.scorer.start()
+
+    def stop(self):
+        """
+        Stop scoring once the batches already queued are scored
+        :return: void
+        """
+        self.requests.put(None)
+        self.scorer.join()
+
+    def submit(self, batch):
+        """
+        Queue a batch and wait for it to be scored
+        :param batch: bytes of CoNLL lines
+        :return: bytes of the response
+        """
+        fd, batch_file = tempfile.mkstemp(suffix='.conll', dir=self.batch_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(batch)
+        request = ScoringRequest(batch_file, len(batch))
+        try:
+            self.requests.put_nowait(request)
+        except queue.Full:
+            os.remove(batch_file)
+            return self.ERROR + b'queue full\n' + self.BATCH_END + b'\n'
+        request.done.wait()
+        return request.response
+
+    def run_scorer(self):
+        """
+        Score queued batches in order until stopped
+        :return: void
+        """
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            request.started = time.perf_counter()
+            try:
+                out = io.StringIO()
+                relations = self.bootstrapper.score_batch(request.batch_file, out)
+                response = out.getvalue().encode()
+            except Exception as e:
+                relations = None
+                # the message goes on one line, so clients can still find the end of the response
+                response = self.ERROR + ' '.join(str(e).splitlines()).encode() + b'\n'
+            finally:
+                os.remove(request.batch_file)
+            metrics = self.get_metrics(request, relations)
+            request.response = response + self.METRICS + json.dumps(metrics).encode() + b'\n' + self.BATCH_END + b'\n'
+            request.done.set()
+
+    def get_metrics(self, request, relations):
+        """
+        Time the stages of a request and log them
+        :param request: ScoringRequest that was just scored
+        :param relations: the number of relations found, or None if scoring failed
+        :return: dict of metric name to value
+        """
+        finished = time.perf_counter()
+        self.served += 1
+        metrics = {'request': self.served, 'bytes': request.size, 'relations': relations,
+                   'queued_ms': round((request.started - request.submitted) * 1000, 3),
+                   'scoring_ms': round((finished - request.started) * 1000, 3),
+                   'total_ms': round((finished - request.submitted) * 1000, 3),
+                   'queue_length': self.requests.qsize()}
+        sys.stderr.write("request {request}: {relations} relations, {bytes} bytes, queued {queued_ms}ms, "
+                         "scored {scoring_ms}ms, total {total_ms}ms\n".format(**metrics))
+        return metrics
+
+    def handle_stream(self, rfile, wfile):
+        """
+        Answer the batches read from a client until it closes its side
+        :param rfile: binary file object to read batches from
+        :param wfile: binary file object to write responses to
+        :return: void
+        """
+        batch = []
+        for line in rfile:
+            if line.rstrip() == self.BATCH_END:
+                wfile.write(self.submit(b''.join(batch)))
+                wfile.flush()
+                batch = []
+            else:
+                batch.append(line)
+        if any(line.strip() for line in batch):
+            wfile.write(self.submit(b''.join(batch)))
+            wfile.flush()
+
+    def serve_stdin(self):
+        """
+        Answer batches read from stdin on stdout
+        :return: void
+        """
+        self.handle_stream(sys.stdin.buffer, sys.stdout.buffer)
+
+    def serve_socket(self, socket_file):
+        """
+        Answer clients connecting to a Unix socket, each in its own thread, until interrupted
+        :param socket_file: path of the socket
+        :return: void
+        """
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                service.handle_stream(self.rfile, self.wfile)
+
+        if os.path.exists(socket_file):
+            os.remove(socket_file)
+        server = socketserver.ThreadingUnixStreamServer(socket_file, Handler)
+        server.daemon_threads = True
+        # a terminated service removes its socket on the way out
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        sys.stderr.write("serving on " + socket_file + "\n")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.remove(socket_file)
+
+    def serve(self, socket_file):
+        """
+        Load the models and answer batches until the input ends or the service is interrupted
+        :param socket_file: path of a Unix socket, or - for stdin and stdout
+        :return: void
+        """
+        self.start()
+        try:
+            if socket_file == '-':
+                self.serve_stdin()
+            else:
+                self.serve_socket(socket_file)
+        finally:
+            self.stop()
@@ -1,15 +1,26 @@
 """
 Seed object to represent seed examples for bootstrapping
 """
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 import numpy as np
 import pickle
+from src.BECR.embedding_store import EmbeddingStore
 
 
 class Seed:
 
-    glove_embeddings = emo_embedding = cause_embedding = cosine = cycle = bad = None
+    # memory-mapped GLoVe vectors, one row per word of glove_index
+    glove_matrix = glove_index = None
+    # the type context vectors are stored in
+    dtype = np.float64
+    emo_embedding = cause_embedding = cosine = cycle = bad = None
     bef, btwn, aft = [], [], []
 
+    # as a candidate: the number of seed matches it has been compared with, and its best score against them above tau
+    compared = max_cosine = 0
+
     def __init__(self, emotion, cause, tweet, glove_size):
         """
         Initialize by setting the emotion and cause values
@@ -26,12 +37,24 @@ class Seed:
     @staticmethod
     def load_glove_embeddings(glove_size):
         """
-        Load the GLoVe embedding files
+        Memory-map the GLoVe embedding store, converting the pickled embedding dictionary to it on first use
         :param glove_size: the size of the file to order
         :return: void
         """
-        glove_file = '../../lib/glove/glove' + str(glove_size) + '.pkl'
-        Seed.glove_embeddings = pickle.load(open(glove_file, 'rb'))
+        glove_file = '../../lib/glove/glove' + str(glove_size)
+        store = EmbeddingStore(glove_file)
+        loaded = store.load(glove_size)
+        if loaded is None:
+            # there is no store yet, or one left incomplete or of other vectors
+            glove_embeddings = pickle.load(open(glove_file + '.pkl', 'rb'))
+            store.save(glove_embeddings)
+            loaded = store.load(glove_size)
+            if loaded is None:
+                matrix = np.array(list(glove_embeddings.values()), dtype=store.DTYPE)
+                if matrix.shape[1:] != (glove_size,):
+                    raise ValueError(glove_file + ".pkl does not hold vectors of size " + str(glove_size))
+                loaded = {word: row for row, word in enumerate(glove_embeddings)}, matrix
+        Seed.glove_index, Seed.glove_matrix = loaded
 
     def calc_glove_score(self, context):
         """
@@ -39,13 +62,40 @@ class Seed:
         :param context: list of text objects
         :return: vector
         """
-        context_embedding = np.full(self.glove_size, 1.e-28)
-        for word in context:
-            if word in Seed.glove_embeddings.keys():
-                word_vec = np.array(Seed.glove_embeddings[word])
-                context_embedding += word_vec
+        # the vectors are added in the order of the words, starting from 1e-28
+        rows = [Seed.glove_index[word] for word in context if word in Seed.glove_index]
+        if not rows:
+            return np.full(self.glove_size, 1.e-28, dtype=Seed.dtype)
+        return Seed.glove_matrix[rows].sum(axis=0, dtype=np.float64, initial=1.e-28).astype(Seed.dtype, copy=False)
+
+    def get_prefix_embeddings(self):
+        """
+        Get the cumulative sums of the GLoVe vectors of the tweet's tokens in float64, computed once per tweet and
+        kept on it
+        :return: array with a row per token boundary; row i is the sum of the first i token vectors
+        """
+        if self.tweet.prefix_embeddings is None:
+            tokens = self.tweet.tokens
+            rows = np.array([Seed.glove_index.get(word, -1) for word in tokens], dtype=np.int64)
+            known = np.flatnonzero(rows >= 0)
+            prefix = np.zeros((len(tokens) + 1, self.glove_size))
+            prefix[known + 1] = Seed.glove_matrix[rows[known]]
+            self.tweet.prefix_embeddings = np.cumsum(prefix, axis=0, out=prefix)
+        return self.tweet.prefix_embeddings
 
-        return context_embedding
+    def get_span_embedding(self, start, stop):
+        """
+        Get the GLoVe embedding of a span of the tweet's tokens as the difference of two prefix sums, which matches
+        calc_glove_score of their text up to rounding
+        :param start: start of the span, as in a slice of the tokens
+        :param stop: end of the span, as in a slice of the tokens
+        :return: vector
+        """
+        start, stop, _ = slice(start, stop).indices(len(self.tweet.tokens))
+        if stop <= start:
+            return np.full(self.glove_size, 1.e-28, dtype=Seed.dtype)
+        prefix = self.get_prefix_embeddings()
+        return (prefix[stop] - prefix[start] + 1.e-28).astype(Seed.dtype, copy=False)
 
     def get_context_before(self, reln1):
         """
@@ -53,11 +103,7 @@ class Seed:
         :param reln1: the given relation, a Word object
         :return: void
         """
-        before = self.tweet.tokens[0:reln1[0].idx-1]
-        if before:
-            self.bef = self.calc_glove_score(before)
-        else:
-            self.bef = np.full(self.glove_size, 1.e-28)
+        self.bef = self.get_span_embedding(0, reln1[0].idx - 1)
 
     def get_context_btwn(self, reln1, reln2):
         """
@@ -66,11 +112,7 @@ class Seed:
         :param reln2: the second relation,
         :return: void
         """
-        between = self.tweet.tokens[reln1[-1].idx:reln2[0].idx-1]
-        if between:
-            self.btwn = self.calc_glove_score(between)
-        else:
-            self.btwn = np.full(self.glove_size, 1.e-28)
+        self.btwn = self.get_span_embedding(reln1[-1].idx, reln2[0].idx - 1)
 
     def get_context_after(self, reln2):
         """
@@ -78,8 +120,4 @@ class Seed:
         :param reln2: the given relation, a Word object
         :return: void
         """
-        after = self.tweet.tokens[reln2[-1].idx:-1]
-        if after:
-            self.aft = self.calc_glove_score(after)
-        else:
-            self.aft = np.full(self.glove_size, 1.e-28)
\ No newline at end of file
+        self.aft = self.get_span_embedding(reln2[-1].idx, -1)
@@ -0,0 +1,87 @@
+"""
+Compact model of the seed matches found in training, for scoring candidates in the test phase
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import numpy as np
+from src.BECR.array_file import ArrayFile
+from src.BECR.context_matrix import ContextMatrix
+from src.BECR.seed_patterns import SeedPatterns
+
+
+class SeedModel:
+    """
+    Stores what the test phase needs of each seed match: its stacked context vectors and bad seed flag,
+    plus its cosine score, cycle and emotion and cause text, and the patterns of the seeds if training clustered
+    them. The file is memory-mapped, so it loads without rebuilding the Seed, Tweet and WordNode objects a pickled
+    seed list drags along
+    """
+
+    MAGIC = b'BECRSM'
+
+    def __init__(self, matrix, cosine, cycle, emotions, causes, patterns=None):
+        """
+        Initialize with the seed data
+        :param matrix: ContextMatrix of the seeds
+        :param cosine: array of cosine scores
+        :param cycle: array of the cycles the seeds were found in
+        :param emotions: list of emotion phrases
+        :param causes: list of cause phrases
+        :param patterns: SeedPatterns of the bad and of the good seeds, or None
+        """
+        self.matrix = matrix
+        self.cosine = cosine
+        self.cycle = cycle
+        self.emotions = emotions
+        self.causes = causes
+        self.patterns = patterns
+
+    @classmethod
+    def from_seeds(cls, seeds, glove_size):
+        """
+        Build the model of a list of seed matches
+        :param seeds: list of Seed objects
+        :param glove_size: the size of the vectors
+        :return: SeedModel
+        """
+        return cls(ContextMatrix.from_seeds(seeds, glove_size),
+                   np.array([seed.cosine for seed in seeds], dtype=np.float64),
+                   np.array([seed.cycle for seed in seeds], dtype=np.int32),
+                   [" ".join([s.text for s in seed.emotion.phrase]) for seed in seeds],
+                   [" ".join([d.text for d in seed.cause]) for seed in seeds])
+
+    def __len__(self):
+        """
+        The number of seeds
+        :return: int
+        """
+        return len(self.matrix)
+
+    def save(self, file_name):
+        """
+        Write the model
+        :param file_name: the model file
+        :return: void
+        """
+        arrays = self.matrix.get_arrays() + [('cosine', self.cosine), ('cycle', self.cycle)]
+        for name, texts in (('emotions', self.emotions), ('causes', self.causes)):
+            arrays.append((name, np.frombuffer('\n'.join(texts).encode(), dtype=np.uint8)))
+        info = {'seeds': len(self)}
+        if self.patterns is not None:
+            pattern_arrays, info['patterns'] = SeedPatterns.get_pair_arrays(self.patterns)
+            arrays += pattern_arrays
+        ArrayFile(file_name, self.MAGIC).save(arrays, info)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Memory-map a model written by save
+        :param file_name: the model file
+        :return: SeedModel
+        """
+        arrays, info = ArrayFile(file_name, cls.MAGIC).load()
+        texts = [arrays[name][0].tobytes().decode().split('\n') if info['seeds'] else []
+                 for name in ('emotions', 'causes')]
+        patterns = SeedPatterns.from_pair_arrays(arrays, info['patterns']) if info.get('patterns') else None
+        return cls(ContextMatrix.from_arrays(arrays), arrays['cosine'][0], arrays['cycle'][0], *texts, patterns)
@@ -0,0 +1,269 @@
+"""
+Clusters of seed matches with centroid vectors, as the patterns of Snowball and BREDS
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import numpy as np
+from src.BECR.array_file import ArrayFile
+
+
+class SeedPatterns:
+    """
+    Groups the good or the bad seeds of a list of seed matches into patterns. Seeds are added a batch at a time, as
+    bootstrapping appends them: a seed joins the pattern whose centroid it is most similar to, if that similarity is
+    at least the pattern threshold, and the seeds left start new patterns around the first of them that is not yet in
+    one. Each pattern keeps the direction of its centroid and, per component, the widest angle between it and a
+    member. A candidate at angle phi from a centroid is then at least phi minus that angle from every member, which
+    bounds its similarity with all the members of the pattern without comparing it with any of them
+    """
+
+    # allowance for rounding in the bounds, so a pattern is only skipped if none of its members can be close
+    BOUND_MARGIN = 1e-6
+    MAGIC = b'BECRSP'
+    # names the patterns of the bad and of the good seeds are stored under
+    NAMES = ('bad_patterns', 'good_patterns')
+
+    def __init__(self, bad, weights, pattern_tau, centroids=None, radii=None, columns=None, labels=None, count=0):
+        """
+        Initialize with the patterns, or none
+        :param bad: whether the patterns group the bad seeds or the good ones
+        :param weights: weights of the components the seeds are clustered by, in the order of ContextMatrix.COMPONENTS
+        :param pattern_tau: the similarity with a centroid needed to join its pattern
+        :param centroids: list of 2-d arrays, one per component with the unit centroid direction of each pattern
+        :param radii: 2-d array of the widest member angle of each pattern and component
+        :param columns: index array of the seeds that were clustered
+        :param labels: array of the pattern of each clustered seed
+        :param count: the number of seed matches considered so far, clustered or not
+        """
+        self.bad = bad
+        self.weights = weights
+        self.pattern_tau = pattern_tau
+        self.centroids = centroids
+        self.radii = radii if radii is not None else np.zeros((0, len(weights)))
+        self.columns = columns if columns is not None else np.zeros(0, dtype=np.int64)
+        self.labels = labels if labels is not None else np.zeros(0, dtype=np.int64)
+        self.count = count
+        self.set_members()
+
+    def set_members(self):
+        """
+        Index the members of each pattern, and the cosine and sine of its angles
+        :return: void
+        """
+        order = np.argsort(self.labels, kind='stable')
+        self.members = np.split(order, np.cumsum(np.bincount(self.labels, minlength=len(self.radii)))[:-1])
+        self.cos_radii = np.cos(self.radii)
+        self.sin_radii = np.sin(self.radii)
+
+    def __len__(self):
+        """
+        The number of patterns
+        :return: int
+        """
+        return len(self.radii)
+
+    def get_sims(self, components, directions):
+        """
+        Weighted similarities of seeds with directions, in one matrix product of the weighted components laid
+        side by side
+        :param components: list of 2-d arrays, one per component with a row per seed
+        :param directions: list of 2-d arrays, one per component with a row per direction
+        :return: 2-d array with a row per seed and a column per direction
+        """
+        return np.hstack([weight * c for weight, c in zip(self.weights, components)]) @ np.hstack(directions).T
+
+    def add(self, seeds, start=0):
+        """
+        Cluster the seeds of a matrix that are not yet in a pattern
+        :param seeds: ContextMatrix of the seed matches from start on
+        :param start: the index of the first seed of the matrix among all seed matches
+        :return: this SeedPatterns
+        """
+        if start > self.count:
+            raise ValueError("seed matches {} to {} were never added to the patterns".format(self.count, start))
+        new = self.count - start + np.flatnonzero(seeds.bad[self.count - start:] == self.bad)
+        self.count = max(self.count, start + len(seeds))
+        if not len(new):
+            return self
+        components = [c[new] for c in seeds.components]
+        labels = np.full(len(new), -1, dtype=np.int64)
+
+        # seeds close enough to a pattern centroid join the closest
+        if len(self):
+            sims = self.get_sims(components, self.centroids)
+            best = sims.argmax(axis=1)
+            close = sims[np.arange(len(new)), best] >= self.pattern_tau
+            labels[close] = best[close]
+
+        # the others start new patterns, each with the seeds left that are close enough to its first seed
+        centroids = []
+        unassigned = np.flatnonzero(labels < 0)
+        while len(unassigned):
+            first = unassigned[0]
+            sims = self.get_sims([c[unassigned] for c in components], [c[first:first + 1] for c in components])
+            joined = unassigned[(sims[:, 0] >= self.pattern_tau) | (unassigned == first)]
+            labels[joined] = len(self) + len(centroids)
+            centroids.append([c[joined].sum(axis=0) for c in components])
+            unassigned = np.setdiff1d(unassigned, joined, assume_unique=True)
+
+        if centroids:
+            added = [self.normalize(np.array(c)) for c in zip(*centroids)]
+            self.centroids = added if self.centroids is None else [np.concatenate(c) for c in zip(self.centroids,
+                                                                                                  added)]
+            self.radii = np.concatenate([self.radii, np.zeros((len(centroids), len(self.weights)))])
+
+        # a centroid stays where its first members put it, so only the angles of the new members can widen it
+        for k, (c, d) in enumerate(zip(components, self.centroids)):
+            angles = np.arccos(np.clip(np.einsum('ij,ij->i', c, d[labels]), -1, 1))
+            np.maximum.at(self.radii[:, k], labels, angles)
+
+        self.columns = np.concatenate([self.columns, start + new])
+        self.labels = np.concatenate([self.labels, labels])
+        self.set_members()
+        return self
+
+    @staticmethod
+    def normalize(vectors):
+        """
+        Scale each row to unit length
+        :param vectors: 2-d array, one vector per row
+        :return: 2-d array
+        """
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        # members that cancel out leave a zero centroid, which is at a right angle to everything
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def select(self, start):
+        """
+        Get the patterns of the seeds from start on, with the seeds counted from start. The centroids and angles of
+        the patterns still cover their earlier members, so they still bound the similarities with the rest
+        :param start: the index of the first seed to keep
+        :return: SeedPatterns
+        """
+        if not start:
+            return self
+        kept = self.columns >= start
+        patterns, labels = np.unique(self.labels[kept], return_inverse=True)
+        centroids = None if self.centroids is None else [c[patterns] for c in self.centroids]
+        return SeedPatterns(self.bad, self.weights, self.pattern_tau, centroids,
+                            self.radii[patterns], self.columns[kept] - start, labels.reshape(-1).astype(np.int64),
+                            self.count - start)
+
+    def get_arrays(self, name):
+        """
+        The arrays to store the patterns in a file
+        :param name: the name the arrays are stored under
+        :return: list of (name, array) pairs
+        """
+        arrays = [(name + '_radii', self.radii), (name + '_columns', self.columns), (name + '_labels', self.labels)]
+        if self.centroids is not None:
+            arrays += [(name + '_centroids', c) for c in self.centroids]
+        return arrays
+
+    def get_info(self):
+        """
+        The settings to store the patterns in a file
+        :return: dict
+        """
+        return {'bad': bool(self.bad), 'weights': list(self.weights), 'pattern_tau': self.pattern_tau,
+                'count': int(self.count)}
+
+    @classmethod
+    def from_arrays(cls, arrays, name, info):
+        """
+        Get the patterns back from the arrays and settings they were stored as
+        :param arrays: dict of name to the list of arrays with that name
+        :param name: the name the arrays were stored under
+        :param info: dict of the settings
+        :return: SeedPatterns
+        """
+        return cls(info['bad'], tuple(info['weights']), info['pattern_tau'], arrays.get(name + '_centroids'),
+                   arrays[name + '_radii'][0], arrays[name + '_columns'][0], arrays[name + '_labels'][0],
+                   info['count'])
+
+    @classmethod
+    def get_pair_arrays(cls, patterns):
+        """
+        The arrays and settings to store the patterns of the bad and of the good seeds in a file
+        :param patterns: SeedPatterns of the bad and of the good seeds
+        :return: list of (name, array) pairs, and list of the settings of each
+        """
+        arrays = [array for name, p in zip(cls.NAMES, patterns) for array in p.get_arrays(name)]
+        return arrays, [p.get_info() for p in patterns]
+
+    @classmethod
+    def from_pair_arrays(cls, arrays, infos):
+        """
+        Get the patterns of the bad and of the good seeds back from the arrays and settings they were stored as
+        :param arrays: dict of name to the list of arrays with that name
+        :param infos: list of the settings of each
+        :return: SeedPatterns of the bad and of the good seeds
+        """
+        return tuple(cls.from_arrays(arrays, name, info) for name, info in zip(cls.NAMES, infos))
+
+    @classmethod
+    def save_pair(cls, patterns, file_name):
+        """
+        Write the patterns of the bad and of the good seeds to a file that load_pair can memory-map
+        :param patterns: SeedPatterns of the bad and of the good seeds
+        :param file_name: the output file
+        :return: void
+        """
+        arrays, infos = cls.get_pair_arrays(patterns)
+        ArrayFile(file_name, cls.MAGIC).save(arrays, infos)
+
+    @classmethod
+    def load_pair(cls, file_name):
+        """
+        Memory-map the patterns written by save_pair
+        :param file_name: the file
+        :return: SeedPatterns of the bad and of the good seeds
+        """
+        arrays, infos = ArrayFile(file_name, cls.MAGIC).load()
+        return cls.from_pair_arrays(arrays, infos)
+
+    def bounds(self, candidates, weights, rows):
+        """
+        Upper bounds of the weighted similarity of candidates with any member of each pattern
+        :param candidates: ContextMatrix
+        :param weights: weights of the components, in the order of ContextMatrix.COMPONENTS
+        :param rows: index array of the candidates
+        :return: 2-d array with a row per candidate and a column per pattern
+        """
+        bound = np.zeros((len(rows), len(self)))
+        for k, (weight, vectors, centroids) in enumerate(zip(weights, candidates.components, self.centroids)):
+            if not weight:
+                continue
+            # cos(phi -/+ radius) from cos(phi) without computing the angles; a negative weight is bounded by the
+            # least similar a member can be
+            cos_phi = np.clip(vectors[rows] @ centroids.T, -1, 1)
+            sin_phi = np.sqrt(1 - cos_phi * cos_phi)
+            cos_radius, sin_radius = self.cos_radii[:, k], self.sin_radii[:, k]
+            if weight > 0:
+                bound += weight * np.where(cos_phi > cos_radius, 1, cos_phi * cos_radius + sin_phi * sin_radius)
+            else:
+                bound += weight * np.where(cos_phi < -cos_radius, -1, cos_phi * cos_radius - sin_phi * sin_radius)
+        return bound + self.BOUND_MARGIN
+
+    def weighted_sim(self, candidates, seeds, weights, rows, threshold):
+        """
+        Weighted similarities of candidates with the clustered seeds, compared only with the members of patterns
+        whose bound is above the threshold. Similarities that cannot be above it are left at -inf
+        :param candidates: ContextMatrix of the candidates
+        :param seeds: ContextMatrix of the seeds these patterns were clustered from
+        :param weights: weights of the components, in the order of ContextMatrix.COMPONENTS
+        :param rows: index array of the candidates
+        :param threshold: similarity that matters
+        :return: 2-d array with a row per candidate and a column per clustered seed
+        """
+        sim = np.full((len(rows), len(self.columns)), -np.inf)
+        if not len(self):
+            return sim
+        close = self.bounds(candidates, weights, rows) > threshold
+        for pattern in np.flatnonzero(close.any(axis=0)):
+            members = self.members[pattern]
+            pattern_rows = np.flatnonzero(close[:, pattern])
+            sim[np.ix_(pattern_rows, members)] = candidates.weighted_sim(seeds, weights, rows[pattern_rows],
+                                                                         self.columns[members], threshold)
+        return sim
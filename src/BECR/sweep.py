@@ -0,0 +1,252 @@
+"""
+Sweep bootstrapping weights and thresholds over one set of precomputed component similarities
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import json
+import itertools
+import numpy as np
+from src.BECR.context_matrix import ContextMatrix
+
+
+class ParameterSweep:
+    """
+    The score of a candidate against a seed is a weighted sum of five component cosine similarities, which do not
+    depend on the weights. When they fit in the memory budget, the sweep computes the component similarities of
+    every candidate with every seed it could meet once, and then replays bootstrapping for each setting of a grid of
+    weights and thresholds by recombining them. Otherwise each cycle of a replay scores the candidates against the
+    seeds it adds in chunks that fit, as RuleBootstrapper does. Decisions are those of RuleBootstrapper except for
+    scores within rounding of a threshold
+    """
+
+    # bootstrapper attributes that can be swept; the thresholds vary fastest, so the weighted sums of the
+    # component similarities are computed once for all the thresholds of a setting of the weights
+    PARAMETERS = ('alpha', 'beta', 'gamma', 'delta', 'epsilon',
+                  'neg_alpha', 'neg_beta', 'neg_gamma', 'neg_delta', 'neg_epsilon', 'tau', 'neg_tau')
+    # weights of the components, in the order of ContextMatrix.COMPONENTS
+    WEIGHTS = ('alpha', 'beta', 'gamma', 'epsilon', 'delta')
+    NEG_WEIGHTS = ('neg_alpha', 'neg_beta', 'neg_gamma', 'neg_epsilon', 'neg_delta')
+
+    def __init__(self, bootstrapper, grid_file):
+        """
+        Initialize with the bootstrapper whose settings are the defaults of the grid
+        :param bootstrapper: RuleBootstrapper
+        :param grid_file: JSON file mapping parameter names to lists of values
+        """
+        self.bootstrapper = bootstrapper
+        self.grid = json.load(open(grid_file))
+        self.space = self.candidates = None
+        unknown = set(self.grid) - set(self.PARAMETERS)
+        if unknown:
+            raise ValueError("cannot sweep " + ", ".join(sorted(unknown)))
+
+    def get_configurations(self):
+        """
+        Get every combination of the grid values, with the bootstrapper's settings for parameters not in the grid
+        :return: list of dicts of parameter to value, in the order of the product of the PARAMETERS values
+        """
+        values = [self.grid.get(name, [getattr(self.bootstrapper, name)]) for name in self.PARAMETERS]
+        return [dict(zip(self.PARAMETERS, combination)) for combination in itertools.product(*values)]
+
+    def run(self, candidate_seeds, seed_matches, output_file):
+        """
+        Replay bootstrapping for every configuration and write one JSON line per configuration
+        :param candidate_seeds: list of candidate Seed objects
+        :param seed_matches: list of initial Seed object matches, or the SeedModel in the test phase
+        :param output_file: the output file name
+        :return: void
+        """
+        bootstrapper = self.bootstrapper
+        configurations = self.get_configurations()
+        candidates = ContextMatrix.from_seeds(candidate_seeds, bootstrapper.glove_size)
+        if bootstrapper.is_test:
+            seeds = seed_matches.matrix
+        else:
+            seeds = ContextMatrix.from_seeds(seed_matches, bootstrapper.glove_size)
+
+        # in training, candidates become seeds, so they are compared with each other too
+        space = seeds if bootstrapper.is_test else ContextMatrix(
+            [np.concatenate(v) for v in zip(seeds.vectors, candidates.vectors)],
+            np.concatenate([seeds.bad, np.zeros(len(candidates), dtype=bool)]),
+            [np.concatenate(c) for c in zip(seeds.components, candidates.components)])
+
+        # only components weighted in some configuration are computed, with a row per seed and a column per candidate;
+        # with the weighted sums and a buffer, they take 8 bytes per seed and candidate each
+        used = [k for k in range(len(ContextMatrix.COMPONENTS))
+                if any(c[self.WEIGHTS[k]] or c[self.NEG_WEIGHTS[k]] for c in configurations)]
+        self.space, self.candidates = space, candidates
+        precompute = 8 * len(space) * len(candidates) * (len(used) + 3) <= self.get_budget()
+        if precompute:
+            similarities = {k: np.clip(space.components[k] @ candidates.components[k].T, -1, 1) for k in used}
+        else:
+            sys.stderr.write("similarities do not fit in --memory_budget, computing them in chunks per cycle\n")
+
+        # candidates that share an emotion word exclude each other
+        groups = {}
+        emotion_groups = np.array([groups.setdefault(id(c.emotion), len(groups)) for c in candidate_seeds],
+                                  dtype=np.int64)
+
+        # the text of every relation that can be output, joined once for all configurations
+        initial = [] if bootstrapper.is_test else [self.get_relation(seed) for seed in seed_matches]
+        relations = [self.get_relation(seed) for seed in candidate_seeds]
+
+        weights = neg_weights = sims = neg_sims = None
+        with open(output_file, 'w') as out:
+            for configuration in configurations:
+                if precompute and weights != [configuration[name] for name in self.WEIGHTS]:
+                    weights = [configuration[name] for name in self.WEIGHTS]
+                    sims = self.combine(similarities, weights, len(space), len(candidates))
+                if precompute and neg_weights != [configuration[name] for name in self.NEG_WEIGHTS]:
+                    neg_weights = [configuration[name] for name in self.NEG_WEIGHTS]
+                    neg_sims = self.combine(similarities, neg_weights, len(space), len(candidates))
+
+                result = self.replay(configuration, sims, neg_sims, space.bad, len(seeds), emotion_groups,
+                                     len(groups))
+                result.update(configuration)
+                result['relations'] = self.get_relations(result.pop('decisions'), initial, relations)
+                print(json.dumps(result), file=out)
+        self.space = self.candidates = None
+
+    def get_budget(self):
+        """
+        The bytes of similarities the sweep may hold at once
+        :return: int
+        """
+        return int(self.bootstrapper.memory_budget * 2 ** 20)
+
+    def combine(self, similarities, weights, seeds, candidates):
+        """
+        Weighted sum of the component similarities
+        :param similarities: dict of component index to similarity matrix
+        :param weights: weights of the components, in the order of ContextMatrix.COMPONENTS
+        :param seeds: the number of seeds
+        :param candidates: the number of candidates
+        :return: 2-d array with a row per seed and a column per candidate
+        """
+        sim = np.zeros((seeds, candidates))
+        buffer = np.empty_like(sim)
+        for k, weight in enumerate(weights):
+            if weight:
+                sim += np.multiply(similarities[k], weight, out=buffer)
+        return sim
+
+    def replay(self, configuration, sims, neg_sims, seed_bad, initial_seeds, emotion_groups, group_count):
+        """
+        Run the bootstrapping cycles of one configuration, as RuleBootstrapper.find_new_relations would
+        :param configuration: dict of parameter to value
+        :param sims: weighted similarities of the seeds and candidates, or None to compute them per cycle
+        :param neg_sims: similarities weighted for bad seeds, or None to compute them per cycle
+        :param seed_bad: the bad seed flags of the initial seeds followed, in training, by the candidates
+        :param initial_seeds: the number of initial seeds
+        :param emotion_groups: array of the emotion word group of each candidate
+        :param group_count: the number of emotion word groups
+        :return: dict with the seed counts, cycles run and the decisions of the candidates
+        """
+        bootstrapper = self.bootstrapper
+        tau, neg_tau = configuration['tau'], configuration['neg_tau']
+
+        count = len(emotion_groups)
+        taken = np.zeros(group_count, dtype=bool)
+        bad = np.zeros(count, dtype=bool)
+        max_cosine = np.zeros(count)
+        cycle = np.full(count, -1, dtype=np.int64)
+        seed_columns = list(range(initial_seeds))
+        seed_bad = seed_bad.copy()
+        compared = 0
+
+        cycles = 1 if bootstrapper.is_test else bootstrapper.cycles
+        cycles_run = 0
+        for i in range(cycles):
+            cycles_run += 1
+            rows = np.flatnonzero(~taken[emotion_groups])
+            columns = np.array(seed_columns[compared:], dtype=np.int64)
+            compared = len(seed_columns)
+
+            # only the seeds added since the last cycle are compared, against all candidates at once
+            bad_columns = columns[seed_bad[columns]]
+            good_columns = columns[~seed_bad[columns]]
+            # the best similarity above tau is the best similarity, if that is above tau
+            if len(bad_columns):
+                neg_weights = [configuration[name] for name in self.NEG_WEIGHTS]
+                bad[rows] |= self.get_best(neg_sims, neg_weights, neg_tau, bad_columns, rows) > neg_tau
+            if len(good_columns):
+                weights = [configuration[name] for name in self.WEIGHTS]
+                best = self.get_best(sims, weights, tau, good_columns, rows)
+                max_cosine[rows] = np.maximum(max_cosine[rows], np.where(best > tau, best, 0))
+
+            # the first decided candidate of each emotion word takes it, as in the sequential loop
+            decided = rows[bad[rows] | (max_cosine[rows] > 0)]
+            _, first = np.unique(emotion_groups[decided], return_index=True)
+            new_seeds = decided[np.sort(first)]
+            taken[emotion_groups[new_seeds]] = True
+            cycle[new_seeds] = 0 if bootstrapper.is_test else i + 1
+
+            if not bootstrapper.is_test:
+                seed_columns.extend(initial_seeds + new_seeds)
+                seed_bad[initial_seeds + new_seeds] = bad[new_seeds]
+                remaining = np.count_nonzero(~taken[emotion_groups])
+                if len(new_seeds) < bootstrapper.min_new_seeds or not remaining:
+                    break
+
+        # new seeds in the order they were added
+        found = np.flatnonzero(cycle >= 0)
+        found = found[np.argsort(cycle[found], kind='stable')]
+        return {'cycles': cycles_run, 'new_seeds': int(np.count_nonzero(~bad[found])),
+                'new_bad_seeds': int(np.count_nonzero(bad[found])),
+                'decisions': (found, np.where(bad[found], 0, max_cosine[found]), cycle[found])}
+
+    def get_best(self, sims, weights, threshold, columns, rows):
+        """
+        The best weighted similarity of each of some candidates with some seeds; only values above the threshold
+        are exact
+        :param sims: the weighted similarities of all seeds and candidates, or None to compute them
+        :param weights: weights of the components, in the order of ContextMatrix.COMPONENTS
+        :param threshold: the similarity that matters
+        :param columns: index array of the seeds
+        :param rows: index array of the candidates
+        :return: array with a value per candidate
+        """
+        if sims is not None:
+            return sims[columns].max(axis=0)[rows]
+
+        # a chunk of seeds and its similarities with the candidates, summed with a buffer, stay within the budget
+        best = np.full(len(rows), -np.inf)
+        chunk = max(1, self.get_budget() // (8 * 2 * max(1, len(rows))))
+        for start in range(0, len(columns), chunk):
+            sim = self.space.weighted_sim(self.candidates, weights, columns[start:start + chunk], rows, threshold)
+            np.maximum(best, sim.max(axis=0), out=best)
+        return best
+
+    def get_relations(self, decisions, initial, relations):
+        """
+        List the relations a configuration outputs, in the order of the output file
+        :param decisions: candidate indices, cosine scores and cycles of the new seeds
+        :param initial: relations of the initial seeds, in training
+        :param relations: relations of the candidates
+        :return: list of [cosine, emotion, cause, tweet index, cycle] lists
+        """
+        output = list(initial)
+        for j, cosine, cycle in zip(decisions[0].tolist(), decisions[1].tolist(), decisions[2].tolist()):
+            output.append([cosine] + relations[j] + [cycle])
+        return sorted(output, key=lambda x: -x[0])
+
+    def get_relation(self, seed):
+        """
+        Get the text and tweet of a seed; initial seeds also get their score and cycle
+        :param seed: Seed object
+        :return: list
+        """
+        relation = [self.get_text(seed.emotion.phrase), self.get_text(seed.cause), int(seed.tweet.idx)]
+        if seed.cosine is not None:
+            relation = [seed.cosine] + relation + [seed.cycle]
+        return relation
+
+    @staticmethod
+    def get_text(words):
+        """
+        Join the text of a phrase
+        :param words: list of Word objects
+        :return: str
+        """
+        return " ".join([w.text for w in words])
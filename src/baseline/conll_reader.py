@@ -0,0 +1,94 @@
+"""
+Stream dependency parsed tweets from TweeboParser CoNLL output
+"""
+import os.path
+import re
+
+
+class ConllReader:
+    """
+    Reads a TweeboParser output file one tweet at a time, so memory use is bounded by the
+    largest tweet rather than by the size of the file
+    """
+
+    # blank lines, found wherever they start so that the last one found ends last
+    BLANK_LINE = re.compile(rb'(?=(\n[ \t\r]*\n))')
+    # the most of the start of a chunk that a blank line ending in it can cover
+    LEADING_BLANK = re.compile(rb'[ \t\r]*\n?')
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, file_name, start=0, end=None):
+        """
+        Initialize this reader with the file to stream
+        :param file_name: the name of the TweeboParser output file
+        :param start: byte offset of the first tweet to read
+        :param end: byte offset at which to stop reading, or None for the end of the file
+        """
+        self.file_name = file_name
+        self.start = start
+        self.end = end
+
+    def split(self, shards):
+        """
+        Split the file into byte ranges of about equal size that each start at a tweet boundary
+        :param shards: the number of ranges
+        :return: list of ConllReader, one per range
+        """
+        end = os.path.getsize(self.file_name) if self.end is None else self.end
+        bounds = [self.start]
+        with open(self.file_name, mode='rb') as f:
+            for shard in range(1, shards):
+                f.seek(max(self.start + (end - self.start) * shard // shards, bounds[-1]))
+                # skip the rest of the current line, then up to the blank line closing the current tweet
+                f.readline()
+                line = f.readline()
+                while line.strip():
+                    line = f.readline()
+                bounds.append(min(f.tell(), end))
+        bounds.append(end)
+        return [ConllReader(self.file_name, start, end) for start, end in zip(bounds, bounds[1:])]
+
+    def last_boundary(self):
+        """
+        Find the end of the last tweet that is closed by a blank line, so a tweet that is still
+        being written to the file is left for a later read
+        :return: byte offset after the blank line, or the start offset if there is none
+        """
+        with open(self.file_name, mode='rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            # each chunk is scanned with the start of the one after it that a blank line could run into,
+            # so the scan reads every byte about once however long the lines are
+            overlap = b''
+            while end > self.start:
+                chunk_start = max(end - self.CHUNK_SIZE, self.start)
+                f.seek(chunk_start)
+                data = f.read(end - chunk_start) + overlap
+                blank_lines = list(self.BLANK_LINE.finditer(data))
+                if blank_lines:
+                    return chunk_start + blank_lines[-1].end(1)
+                overlap = data[:self.LEADING_BLANK.match(data).end()]
+                end = chunk_start
+        return self.start
+
+    def __iter__(self):
+        """
+        Yield the tweets of the file in order
+        :return: generator of tweets, each a list of word feature lists
+        """
+        with open(self.file_name, mode='rb') as f:
+            f.seek(self.start)
+            offset = self.start
+            tweet = []
+            for line in f:
+                if not tweet and self.end is not None and offset >= self.end:
+                    return
+                offset += len(line)
+                line = line.decode(errors='ignore').rstrip()
+                if line:
+                    tweet.append(line.split('\t'))
+                elif tweet:
+                    # a blank line closes the current tweet
+                    yield tweet
+                    tweet = []
+            if tweet:
+                yield tweet
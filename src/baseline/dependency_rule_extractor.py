@@ -5,6 +5,7 @@ Based on outputs from the TweeboParser Dependency Parser
 
 import sys
 import os.path
+from bisect import bisect_left, bisect_right
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from src.baseline.dependency_tweet_loader import TweetLoader
 
@@ -18,23 +19,6 @@ class EmotionCauseRuleExtractor:
     PREP_CONJ = ('P', 'R', 'T')
     VERBS = ('V', 'L')
 
-    def get_dependencies(self, word_list, deps):
-        """
-        Recursively gather all dependencies of the given nodes
-        :param word_list: list of dependency nodes
-        :param deps: current list of dependencies
-        :return: dictionary of all dependencies
-        """
-        if not word_list:
-            return deps
-
-        else:
-            word = word_list.pop()
-            deps.append(word)
-            word_list.extend(word.children)
-
-        return self.get_dependencies(word_list, deps)
-
     def apply_rules(self, emo_word):
         """
         Apply the rules to get a cause for the given emotion in a tweet
@@ -74,16 +58,17 @@ class EmotionCauseRuleExtractor:
         :param rule: the rule being applied
         :return: the emotion cause
         """
-        deps = sorted(self.get_dependencies(word.children[:], []), key=lambda w: w.idx)
-        lhs = [d for d in deps if d.idx < word.idx]
-        rhs = [d for d in deps if d.idx > word.idx]
+        deps = word.corpus.descendants(word.position)
+        # a word is only among its own descendants in a cyclic parse, and is in neither side then
+        lhs = deps[:bisect_left(deps, word.position)]
+        rhs = deps[bisect_right(deps, word.position):]
 
         if rule == 2:
-            return self.strip_prepositions(lhs) if lhs else None
+            return self.strip_prepositions([word.corpus.word(p) for p in lhs]) if lhs else None
         elif rule == 3:
-            return self.strip_prepositions(rhs[1:]) if len(rhs) > 2 else None
+            return self.strip_prepositions([word.corpus.word(p) for p in rhs[1:]]) if len(rhs) > 2 else None
         else:
-            return self.strip_prepositions(rhs) if rhs else None
+            return self.strip_prepositions([word.corpus.word(p) for p in rhs]) if rhs else None
 
     def strip_prepositions(self, phrase):
         """
@@ -115,21 +100,20 @@ class EmotionCauseRuleExtractor:
 def main():
     """
     Apply rules to Tweeboparser outputs and return emotion-cause relations when found for tweets
+    Takes any number of parsed tweet file and output file pairs
     :return: void
     """
-
-    parsed_tweet_file = sys.argv[1]
-    output = sys.argv[2]
-    tweets = TweetLoader(parsed_tweet_file)
-    tweets.extract_emo_relations()
     extractor = EmotionCauseRuleExtractor()
-    emo_list = extractor.build_emo_cause_list(tweets.tweet2emo, tweets.idx2tweet)
-
-    with open(output, 'w') as out:
-        for emotion, cause, sentence in emo_list:
-            cause = " ".join([d.text for d in cause])
-            print("EMOTION: " + emotion.text + "\tCAUSE: " + cause + "\tTWEET: " + sentence, file=out)
-            print("", file=out)
+    for parsed_tweet_file, output in zip(sys.argv[1::2], sys.argv[2::2]):
+        tweets = TweetLoader(parsed_tweet_file)
+        tweets.extract_emo_relations()
+        emo_list = extractor.build_emo_cause_list(tweets.tweet2emo, tweets.idx2tweet)
+
+        with open(output, 'w') as out:
+            for emotion, cause, sentence in emo_list:
+                cause = " ".join([d.text for d in cause])
+                print("EMOTION: " + emotion.text + "\tCAUSE: " + cause + "\tTWEET: " + sentence, file=out)
+                print("", file=out)
 
 
 if __name__ == "__main__":
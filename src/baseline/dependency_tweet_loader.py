@@ -5,62 +5,177 @@ import sys
 import os.path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import pickle
+import hashlib
+from multiprocessing import Pool
 from collections import defaultdict as dd
-from src.baseline.word_node import WordNode as Word
 from src.baseline.tweet import Tweet
+from src.baseline.conll_reader import ConllReader
+from src.baseline.parse_corpus import ParseCorpus
+from src.baseline.parse_cache import ParseCache
 
 
 class TweetLoader:
 
     POS_LIST = ('V', 'A')
 
+    # Tweet tokens and text are lowercased
+    ORIGINAL_TOKENS = False
+
     # For loading curated emotion keyword list
     emo_kws = pickle.load(open('../../lib/emotion_lexicon/emotion_kw_list/emotion_keywords.pkl', "rb"))
 
-    idx2tweet = {}
-    tweet2emo = dd(list)
-    tweet_list = []
-
-    def __init__(self, file_name):
+    def __init__(self, file_name, use_cache=True, workers=1, start=0, end=None, first_tweet=0, prefilter=True):
         """
-        Initialize this class by reading in the tweets
+        Initialize this class with a reader that streams the tweets one at a time
         :param file_name: the name of the input file
+        :param use_cache: read and write the binary parse cache next to the input file
+        :param workers: number of processes to shard parsing and emotion word extraction across
+        :param start: byte offset of the first tweet to load
+        :param end: byte offset at which to stop loading, or None for the end of the file
+        :param first_tweet: index of the tweet at the start offset
+        :param prefilter: only load tweets that contain an emotion keyword with a POS in POS_LIST
+        """
+        self.tweets = ConllReader(file_name, start, end)
+        # the cache covers whole files only
+        self.use_cache = use_cache and start == 0 and end is None
+        self.workers = workers
+        self.first_tweet = first_tweet
+        self.prefilter = prefilter
+        self.corpus = None
+
+        # corpus state belongs to this loader, so one process can load many files
+        self.idx2tweet = {}
+        self.tweet2emo = dd(list)
+        self.tweets_by_idx = {}
+
+    def get_filter_key(self):
+        """
+        Identify the prefilter, which decides what a parse cache contains
+        :return: hex digest, or None without a prefilter
+        """
+        if not self.prefilter:
+            return None
+        return hashlib.sha1("\n".join(sorted(self.emo_kws) + list(self.POS_LIST)).encode()).hexdigest()
+
+    def load_corpus(self):
+        """
+        Load the parsed tweets, memory-mapping the binary parse cache when there is a valid one
+        :return: ParseCorpus, and a mapping of corpus tweet index to emotion words if they were already extracted
+        """
+        cache = ParseCache(self.tweets.file_name, self.get_filter_key()) if self.use_cache else None
+        corpus = cache.load() if cache else None
+        emo_words = None
+        if corpus is None:
+            if self.workers > 1:
+                corpus, emo_words = self.load_shards()
+            else:
+                corpus = self.parse(self.tweets, self.first_tweet)
+            if cache:
+                cache.save(corpus)
+        return corpus, emo_words
+
+    def load_shards(self):
+        """
+        Parse the input in shards across a process pool and merge the shards back in file order
+        :return: ParseCorpus, and a mapping of corpus tweet index to emotion words
+        """
+        corpus = ParseCorpus(self.first_tweet)
+        emo_words = {}
+        with Pool(self.workers) as pool:
+            for shard_corpus, shard_emo_words in pool.imap(self.load_shard, self.tweets.split(self.workers)):
+                tweet_shift, position_shift = corpus.extend(shard_corpus)
+                for tweet_idx, words in shard_emo_words.items():
+                    for word in words:
+                        # the emotion word is the last word of its own phrase
+                        for node in [w for w in word.phrase if w is not word] + [word]:
+                            node.corpus = corpus
+                            node.position += position_shift
+                    emo_words[tweet_idx + tweet_shift] = words
+        return corpus, emo_words
+
+    def load_shard(self, reader):
+        """
+        Parse one shard of the input and extract its emotion words; run in a worker process
+        :param reader: ConllReader over the shard
+        :return: ParseCorpus of the shard, and a mapping of shard tweet index to emotion words
+        """
+        corpus = self.parse(reader)
+        emo_words = {}
+        for tweet_idx in range(len(corpus)):
+            words = self.get_emo_words(corpus, tweet_idx)
+            if words:
+                emo_words[tweet_idx] = words
+        return corpus, emo_words
+
+    def parse(self, reader, first_tweet=0):
+        """
+        Store the tweets of a reader in a corpus, skipping those the prefilter rejects
+        :param reader: ConllReader
+        :param first_tweet: index of the first tweet of the reader
+        :return: ParseCorpus
+        """
+        corpus = ParseCorpus(first_tweet)
+        for tweet in reader:
+            if self.prefilter and not self.has_emo_word(tweet):
+                corpus.skip_tweet()
+            else:
+                corpus.add_tweet(tweet)
+        return corpus
+
+    def has_emo_word(self, tweet):
         """
-        with open(file_name, mode='r', errors='ignore') as f:
+        Cheap check on the raw CoNLL columns for a word that get_emo_words could select
+        :param tweet: list of word feature lists
+        :return: bool
+        """
+        for word_feats in tweet:
+            if word_feats[3] in self.POS_LIST and word_feats[1].lower() in self.emo_kws:
+                return True
+        return False
 
-            tweets = f.read()
-            self.tweets = tweets.rstrip().split('\n\n')
+    def get_emo_words(self, corpus, tweet_idx):
+        """
+        Isolate emotion words that are Verbs or Adjectives
+        :param corpus: ParseCorpus
+        :param tweet_idx: index of the tweet in the corpus
+        :return: list of Word objects
+        """
+        emo_words = []
+        for position in range(*corpus.span(tweet_idx)):
+            if corpus.text(position) in self.emo_kws and corpus.pos_tag(position) in self.POS_LIST:
+                curr_word = corpus.word(position)
+                curr_word.is_emotion_word = True
+                emo_words.append(curr_word)
+        return emo_words
 
     def extract_emo_relations(self):
         """
         Extract emotion words and dependency relations from tweets
         :return:
         """
-        for tweet_idx, tweet in enumerate(self.tweets):
-            tweet_tokens = []
-            idx2word, child2parent = {}, {}
-            for word in tweet.rstrip().split('\n'):
-                if not word:
-                    sys.stderr.write("wat")
-                    continue
-                curr_word = Word(word.rstrip().split('\t'), tweet_idx)
-                idx2word[curr_word.idx] = curr_word
-                child2parent[curr_word] = curr_word.parent
-
-                # Isolate emotion words that are Verbs or Adjectives
-                if curr_word.text in self.emo_kws and curr_word.pos in self.POS_LIST:
-                    self.tweet2emo[tweet_idx].append(curr_word)
-                    curr_word.is_emotion_word = True
-
-                tweet_tokens.append(curr_word.text)
-
-            # update tweet dictionary and add children to words
-            self.add_relatives(child2parent, idx2word)
+        self.corpus, emo_words = self.load_corpus()
+        self.index_tweets(emo_words)
+
+    def index_tweets(self, emo_words=None):
+        """
+        Find the emotion words of each loaded tweet and build the tweet dictionaries
+        :param emo_words: mapping of corpus tweet index to emotion words if they were already extracted
+        :return: void
+        """
+        for corpus_idx in range(len(self.corpus)):
+            tweet_idx = self.corpus.tweet_ids[corpus_idx]
+            if emo_words is None:
+                self.tweet2emo[tweet_idx].extend(self.get_emo_words(self.corpus, corpus_idx))
+            elif corpus_idx in emo_words:
+                self.tweet2emo[tweet_idx].extend(emo_words[corpus_idx])
+
+            # update tweet dictionary
+            tweet_tokens = self.corpus.tokens(corpus_idx, original=self.ORIGINAL_TOKENS)
             tweet_text = " ".join(tweet_tokens)
             self.idx2tweet[tweet_idx] = tweet_text
 
             # Create Tweet object
-            self.add_tweet(tweet_idx, tweet_text, tweet_tokens, list(idx2word.values()))
+            self.add_tweet(tweet_idx, tweet_text, tweet_tokens, self.corpus.words(corpus_idx))
 
     def add_tweet(self, tweet_idx, tweet_text, tweet_tokens, words):
         """
@@ -68,7 +183,7 @@ class TweetLoader:
         :param tweet_idx: index of tweet
         :param tweet_text: raw text of Tweet
         :param tweet_tokens: tokenized list of words in Tweet
-        :param words: list of Word objects
+        :param words: sequence of Word objects
         :return:
         """
         this_tweet = Tweet(tweet_text)
@@ -77,18 +192,5 @@ class TweetLoader:
         this_tweet.index = tweet_idx
         this_tweet.words = words
         this_tweet.emo_words = self.tweet2emo[tweet_idx]
-        self.tweet_list.append(this_tweet)
+        self.tweets_by_idx[tweet_idx] = this_tweet
         return this_tweet
-
-    def add_relatives(self, child2parent, idx2word):
-        """
-        Add dependency relations to the nodes in the current mapping
-        :param child2parent: mapping of child nodes to parent nodes
-        :param idx2word: mapping of index to word
-        :return: void
-        """
-        for child, parent in child2parent.items():
-            if parent not in (0, -1):
-                parent_word = idx2word[parent]
-                parent_word.add_child(child)
-                child.parent = parent_word
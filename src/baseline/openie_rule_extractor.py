@@ -209,27 +209,26 @@ class EmotionCauseRuleExtractor:
 def main():
     """
     Apply rules to OpenIE relations and return emotion-cause relations when found for tweets
+    Takes any number of OpenIE relation file and output file pairs
     :return: void
     """
-
-    tweet_relation_file = sys.argv[1]
-    output = sys.argv[2]
-    tweet_emo_cause = []
-
-    loader = TweetLoader(tweet_relation_file)
-    rules = EmotionCauseRuleExtractor(loader.tweets)
-    for p in loader.patterns:
-        emotion_cause = rules.apply_rules(p)
-        if emotion_cause:
-            tweet_emo_cause.append(emotion_cause)
-
-    with open(output, "w") as out:
-        for line in tweet_emo_cause:
-            emotion_cause = line[1].split(", ")
-            emotion = emotion_cause[0]
-            cause = emotion_cause[1].rstrip()
-            tweet = line[0].lstrip()
-            print("EMOTION: " + emotion + "\tCAUSE: " + cause + "\tTWEET: " + tweet, file=out)
+    for tweet_relation_file, output in zip(sys.argv[1::2], sys.argv[2::2]):
+        tweet_emo_cause = []
+
+        loader = TweetLoader(tweet_relation_file)
+        rules = EmotionCauseRuleExtractor(loader.tweets)
+        for p in loader.patterns:
+            emotion_cause = rules.apply_rules(p)
+            if emotion_cause:
+                tweet_emo_cause.append(emotion_cause)
+
+        with open(output, "w") as out:
+            for line in tweet_emo_cause:
+                emotion_cause = line[1].split(", ")
+                emotion = emotion_cause[0]
+                cause = emotion_cause[1].rstrip()
+                tweet = line[0].lstrip()
+                print("EMOTION: " + emotion + "\tCAUSE: " + cause + "\tTWEET: " + tweet, file=out)
 
 
 if __name__ == "__main__":
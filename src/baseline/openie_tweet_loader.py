@@ -11,14 +11,13 @@ class TweetLoader:
     - Includes preprocessing steps of adding POS tags and emotion values
     """
 
-    patterns = []
-    tweets = []
-
     def __init__(self, relation_file):
         """
         Initialize the class by splitting the OpenIE file into tweet descriptor sections
         :param relation_file: the OpenIE output file with relations extracted from tweets
         """
+        self.patterns = []
+        self.tweets = []
         with open(relation_file, 'r') as f:
             self.tweet_relations = f.read().split('\n\n')
         self.get_patterns()
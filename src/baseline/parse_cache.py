@@ -0,0 +1,161 @@
+"""
+Binary cache of parsed TweeboParser outputs
+"""
+import sys
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+from src.baseline.parse_corpus import ParseCorpus
+
+
+class ParseCache:
+    """
+    Saves a ParseCorpus next to its input file and memory-maps it back on later runs.
+    The cache is only used when it was written by the same loader version from a file with the same content
+    """
+
+    VERSION = 2
+    SUFFIX = '.parse_cache'
+    MAGIC = b'BECRPC'
+    ALIGN = 8
+    # mkstemp creates files only the owner can read
+    MODE = 0o644
+
+    def __init__(self, file_name, filter_key=None):
+        """
+        Initialize with the input file whose parse is cached
+        :param file_name: the TweeboParser output file
+        :param filter_key: identifies the prefilter that decided which tweets were stored
+        """
+        self.file_name = file_name
+        self.cache_file = file_name + self.SUFFIX
+        self.filter_key = filter_key
+        self.file_hash = None
+
+    def get_file_hash(self):
+        """
+        Hash the content of the input file
+        :return: hex digest
+        """
+        if self.file_hash is None:
+            sha = hashlib.sha1()
+            with open(self.file_name, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(chunk)
+            self.file_hash = sha.hexdigest()
+        return self.file_hash
+
+    def get_key(self):
+        """
+        The key a cache file must match to be used
+        :return: dict
+        """
+        return {'version': self.VERSION, 'hash': self.get_file_hash(), 'filter': self.filter_key,
+                'byteorder': sys.byteorder}
+
+    def load(self):
+        """
+        Memory-map the cached corpus
+        :return: ParseCorpus, or None if there is no valid cache
+        """
+        if not os.path.exists(self.cache_file):
+            return None
+
+        # a cache file cut short, e.g. by a crash while it was written, is parsed again and rewritten
+        try:
+            return self.read()
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            sys.stderr.write("Ignoring unreadable parse cache " + self.cache_file + ": " + str(e) + "\n")
+            return None
+
+    def read(self):
+        """
+        Memory-map the cache file, which may be damaged
+        :return: ParseCorpus, or None if the cache is for other input or another version
+        """
+        with open(self.cache_file, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                return None
+            header = json.loads(f.readline().decode())
+            if header['key'] != self.get_key():
+                return None
+            start = self.align(f.tell())
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))[start:]
+
+        # the vocabulary is written last
+        vocab_offset, vocab_length = header['vocab']
+        if len(buffer) < vocab_offset + vocab_length:
+            raise ValueError("file is shorter than its header says")
+
+        corpus = ParseCorpus()
+        for name, (typecode, itemsize, offset, count) in header['columns'].items():
+            if getattr(corpus, name).itemsize != itemsize:
+                return None
+            setattr(corpus, name, buffer[offset:offset + itemsize * count].cast(typecode))
+
+        vocab = bytes(buffer[vocab_offset:vocab_offset + vocab_length])
+        corpus.vocab = vocab.decode().split('\n') if vocab_length else []
+        corpus.token_ids = {text: token_id for token_id, text in enumerate(corpus.vocab)}
+        corpus.pos_tags = header['pos_tags']
+        corpus.pos_ids = {tag: pos_id for pos_id, tag in enumerate(corpus.pos_tags)}
+        corpus.next_tweet = header['next_tweet']
+        return corpus
+
+    def save(self, corpus):
+        """
+        Write the corpus to the cache file; failures only cost the speedup on the next run
+        :param corpus: ParseCorpus
+        :return: void
+        """
+        vocab = '\n'.join(corpus.vocab).encode()
+        header = {'key': self.get_key(), 'columns': {}, 'pos_tags': corpus.pos_tags, 'next_tweet': corpus.next_tweet}
+
+        # columns and then the vocabulary follow the header, each aligned and offset from the end of the header
+        offset = 0
+        blobs = []
+        for name in corpus.COLUMNS:
+            column = getattr(corpus, name)
+            header['columns'][name] = (column.typecode, column.itemsize, offset, len(column))
+            blobs.append(column)
+            offset = self.align(offset + column.itemsize * len(column))
+        header['vocab'] = (offset, len(vocab))
+        blobs.append(vocab)
+
+        # each writer has its own temporary file, so runs caching the same input at once never write into the file
+        # another one has already put in place
+        directory, name = os.path.split(self.cache_file)
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory or '.')
+            with os.fdopen(fd, 'wb') as out:
+                out.write(self.MAGIC + json.dumps(header).encode() + b'\n')
+                self.pad(out)
+                for blob in blobs:
+                    out.write(blob)
+                    self.pad(out)
+            os.chmod(tmp_file, self.MODE)
+            os.replace(tmp_file, self.cache_file)
+            tmp_file = None
+        except OSError as e:
+            sys.stderr.write("Could not write parse cache " + self.cache_file + ": " + str(e) + "\n")
+        finally:
+            if tmp_file is not None:
+                os.remove(tmp_file)
+
+    def pad(self, out):
+        """
+        Pad the output file up to the column alignment
+        :param out: file object
+        :return: void
+        """
+        out.write(b'\0' * (self.align(out.tell()) - out.tell()))
+
+    def align(self, offset):
+        """
+        Round an offset up to the column alignment
+        :param offset: byte offset
+        :return: int
+        """
+        return -(-offset // self.ALIGN) * self.ALIGN
@@ -0,0 +1,316 @@
+"""
+Columnar store of dependency parsed tweets
+"""
+from array import array
+from bisect import bisect_right
+from src.baseline.word_node import WordNode
+
+
+class ParseCorpus:
+    """
+    Stores every token of a parse file in flat per-token arrays instead of one object per token.
+    Tweet t covers the token positions tweet_offsets[t] up to tweet_offsets[t + 1]; tokens are
+    numbered 1..n within a tweet, as TweeboParser writes them
+    """
+
+    MWE_LABELS = (None,) + WordNode.MWE_CONJ
+    COLUMNS = ('idx', 'parent', 'pos', 'token', 'mw', 'tweet_offsets', 'tweet_ids', 'lower')
+
+    def __init__(self, first_tweet=0):
+        """
+        Initialize an empty corpus
+        :param first_tweet: index in the input file of the first tweet read into the corpus
+        """
+        # per-token columns
+        self.idx = array('i')
+        self.parent = array('i')
+        self.pos = array('B')
+        self.token = array('i')
+        self.mw = array('B')
+
+        # per-tweet columns; tweet_offsets has one more entry than there are tweets
+        self.tweet_offsets = array('q', [0])
+        # index in the input file of each stored tweet, since skipped tweets still take up an index
+        self.tweet_ids = array('q')
+        self.next_tweet = first_tweet
+
+        # vocabulary of original token strings; lower maps a token id to the id of its lowercased form
+        self.vocab = []
+        self.lower = array('i')
+        self.pos_tags = []
+        self.token_ids = {}
+        self.pos_ids = {}
+
+        # subtree index of the most recently queried tweet
+        self.subtree_tweet = None
+        self.subtree_offsets = []
+        self.subtree_positions = []
+
+    def __len__(self):
+        """
+        The number of tweets in the corpus
+        :return: int
+        """
+        return len(self.tweet_offsets) - 1
+
+    def __getstate__(self):
+        """
+        Copy columns that are memory-mapped from a parse cache into arrays so the corpus can be pickled
+        :return: dict
+        """
+        state = self.__dict__.copy()
+        for name in self.COLUMNS:
+            column = state[name]
+            if not isinstance(column, array):
+                state[name] = array(column.format)
+                state[name].frombytes(column.tobytes())
+        return state
+
+    def get_token_id(self, text):
+        """
+        Get the vocabulary id of the given token string, adding it if it is new
+        :param text: the token string
+        :return: int
+        """
+        token_id = self.token_ids.get(text)
+        if token_id is None:
+            token_id = self.token_ids[text] = len(self.vocab)
+            self.vocab.append(text)
+            self.lower.append(token_id)
+            lowered = text.lower()
+            if lowered != text:
+                self.lower[token_id] = self.get_token_id(lowered)
+        return token_id
+
+    def get_pos_id(self, tag):
+        """
+        Get the id of the given POS tag, adding it if it is new
+        :param tag: the POS tag
+        :return: int
+        """
+        pos_id = self.pos_ids.get(tag)
+        if pos_id is None:
+            pos_id = self.pos_ids[tag] = len(self.pos_tags)
+            self.pos_tags.append(tag)
+        return pos_id
+
+    def add_tweet(self, tweet):
+        """
+        Append a tweet to the corpus
+        :param tweet: list of word feature lists from the CoNLL file
+        :return: the index of the new tweet
+        """
+        for word_feats in tweet:
+            self.idx.append(int(word_feats[0]))
+            self.token.append(self.get_token_id(word_feats[1]))
+            self.pos.append(self.get_pos_id(word_feats[3]))
+            self.parent.append(int(word_feats[6]))
+            mw = word_feats[7]
+            self.mw.append(self.MWE_LABELS.index(mw) if mw in WordNode.MWE_CONJ else 0)
+        self.tweet_offsets.append(len(self.idx))
+        self.tweet_ids.append(self.next_tweet)
+        self.next_tweet += 1
+        return len(self.tweet_offsets) - 2
+
+    def skip_tweet(self):
+        """
+        Count a tweet of the input without storing it
+        :return: void
+        """
+        self.next_tweet += 1
+
+    def extend(self, other):
+        """
+        Append all tweets of another corpus, mapping its vocabulary and POS tags onto this one
+        :param other: ParseCorpus of the input that follows this one, with its first tweet at index 0
+        :return: the tweet index and token position the other corpus starts at in this one
+        """
+        tweet_shift, position_shift = len(self), len(self.idx)
+        token_map = [self.get_token_id(text) for text in other.vocab]
+        pos_map = [self.get_pos_id(tag) for tag in other.pos_tags]
+
+        self.idx.extend(other.idx)
+        self.parent.extend(other.parent)
+        self.mw.extend(other.mw)
+        self.token.extend(token_map[token_id] for token_id in other.token)
+        self.pos.extend(pos_map[pos_id] for pos_id in other.pos)
+        self.tweet_offsets.extend(offset + position_shift for offset in other.tweet_offsets[1:])
+        self.tweet_ids.extend(tweet_id + self.next_tweet for tweet_id in other.tweet_ids)
+        self.next_tweet += other.next_tweet
+        return tweet_shift, position_shift
+
+    def span(self, tweet_idx):
+        """
+        Get the token positions of a tweet
+        :param tweet_idx: index of the tweet
+        :return: start and end positions
+        """
+        return self.tweet_offsets[tweet_idx], self.tweet_offsets[tweet_idx + 1]
+
+    def tweet_of(self, position):
+        """
+        Get the corpus index of the tweet a token belongs to
+        :param position: token position
+        :return: int
+        """
+        return bisect_right(self.tweet_offsets, position) - 1
+
+    def text(self, position):
+        """
+        Get the lowercased text of a token
+        :param position: token position
+        :return: str
+        """
+        return self.vocab[self.lower[self.token[position]]]
+
+    def original_text(self, position):
+        """
+        Get the text of a token with its capitalization preserved
+        :param position: token position
+        :return: str
+        """
+        return self.vocab[self.token[position]]
+
+    def pos_tag(self, position):
+        """
+        Get the POS tag of a token
+        :param position: token position
+        :return: str
+        """
+        return self.pos_tags[self.pos[position]]
+
+    def head(self, position):
+        """
+        Get the position of the parent of a token
+        :param position: token position
+        :return: parent position, or None for roots (0) and tokens left out of the parse (-1)
+        """
+        parent = self.parent[position]
+        if parent in (0, -1):
+            return None
+        return self.tweet_offsets[self.tweet_of(position)] + parent - 1
+
+    def children(self, position):
+        """
+        Get the positions of the children of a token, in token order
+        :param position: token position
+        :return: list of positions
+        """
+        start, end = self.span(self.tweet_of(position))
+        idx = self.idx[position]
+        parent = self.parent
+        return [p for p in range(start, end) if parent[p] == idx]
+
+    def descendants(self, position):
+        """
+        Get the positions of all descendants of a token, in token order
+        :param position: token position
+        :return: list of positions
+        """
+        tweet_idx = self.tweet_of(position)
+        if tweet_idx != self.subtree_tweet:
+            self.index_subtrees(tweet_idx)
+        local = position - self.tweet_offsets[tweet_idx]
+        return self.subtree_positions[self.subtree_offsets[local]:self.subtree_offsets[local + 1]]
+
+    def index_subtrees(self, tweet_idx):
+        """
+        Build the subtree index of a tweet: the descendants of each token, in token order,
+        stored back to back with the offset of each token's descendants
+        :param tweet_idx: index of the tweet
+        :return: void
+        """
+        start, end = self.span(tweet_idx)
+        descendants = [[] for _ in range(end - start)]
+
+        # visiting tokens in order and adding each to all of its ancestors keeps every list sorted
+        for position in range(start, end):
+            ancestor = self.head(position)
+            # in a cyclic parse the walk comes back to an ancestor it already visited, which ends it
+            visited = set()
+            while ancestor is not None and ancestor not in visited:
+                visited.add(ancestor)
+                descendants[ancestor - start].append(position)
+                ancestor = self.head(ancestor)
+
+        self.subtree_offsets = [0]
+        self.subtree_positions = []
+        for token_descendants in descendants:
+            self.subtree_positions.extend(token_descendants)
+            self.subtree_offsets.append(len(self.subtree_positions))
+        self.subtree_tweet = tweet_idx
+
+    def word(self, position):
+        """
+        Get a node view of a token
+        :param position: token position
+        :return: WordNode
+        """
+        return WordNode(self, position)
+
+    def words(self, tweet_idx):
+        """
+        Get the nodes of a tweet
+        :param tweet_idx: index of the tweet
+        :return: TweetWords
+        """
+        return TweetWords(self, *self.span(tweet_idx))
+
+    def tokens(self, tweet_idx, original=False):
+        """
+        Get the token strings of a tweet
+        :param tweet_idx: index of the tweet
+        :param original: preserve capitalization if True, otherwise lowercase
+        :return: list of str
+        """
+        start, end = self.span(tweet_idx)
+        get_text = self.original_text if original else self.text
+        return [get_text(p) for p in range(start, end)]
+
+
+class TweetWords:
+    """
+    List-like sequence of the nodes of one tweet, created on access
+    """
+
+    __slots__ = ('corpus', 'start', 'end')
+
+    def __init__(self, corpus, start, end):
+        """
+        Initialize with the token positions of the tweet
+        :param corpus: ParseCorpus
+        :param start: position of the first token
+        :param end: position after the last token
+        """
+        self.corpus = corpus
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        """
+        The number of tokens in the tweet
+        :return: int
+        """
+        return self.end - self.start
+
+    def __getitem__(self, item):
+        """
+        Get a node, or a list of nodes for a slice, with list indexing semantics
+        :param item: int or slice
+        :return: WordNode or list of WordNode
+        """
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('tweet word index out of range')
+        return self.corpus.word(self.start + item)
+
+    def __iter__(self):
+        """
+        Iterate over the nodes in token order
+        :return: generator of WordNode
+        """
+        for position in range(self.start, self.end):
+            yield self.corpus.word(position)
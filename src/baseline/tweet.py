@@ -11,6 +11,8 @@ class Tweet:
     mapping = {}
     index = None
     seed = None
+    # cumulative sums of the GLoVe vectors of the tokens, kept while BECR embeds the contexts of the tweet
+    prefix_embeddings = None
 
     def __init__(self, raw):
         """
@@ -6,45 +6,100 @@ A node of the dependency parse
 class WordNode:
     """
     Word Class captures information about words, including POS, dependencies,
-    and emotion and seed status
+    and emotion and seed status, as a lightweight view of one token of a ParseCorpus
     """
 
     MWE_CONJ = ('MW', 'CONJ')
 
-    def __init__(self, word_feats, tweet):
-        """
-        Initialize this node with the word and features
-        :param word_feats: list of word features
-        :param tweet: the tweet this node is in
-        """
-        self.idx = int(word_feats[0])
-        self.text = word_feats[1].lower()
-        # String object of word that preserves capitalization
-        self.original_text = word_feats[1]
-        self.pos = word_feats[3]
-        self.parent = int(word_feats[6])
-        self.mw = word_feats[7] if word_feats[7] in self.MWE_CONJ else None
-        self.tweet_idx = tweet
-        self.children = []
+    __slots__ = ('corpus', 'position', 'is_emotion_word', 'emotion', 'seed', 'bad_seed', 'phrase')
+
+    def __init__(self, corpus, position):
+        """
+        Initialize this node as a view of a token in the corpus
+        :param corpus: the ParseCorpus the token is stored in
+        :param position: the position of the token in the corpus
+        """
+        self.corpus = corpus
+        self.position = position
         self.is_emotion_word = False
+        self.emotion = False
         self.seed = None
         self.bad_seed = None
         self.phrase = []
 
-    def add_child(self, child):
+    @property
+    def idx(self):
+        """
+        Index of the word in its tweet, starting at 1
+        :return: int
+        """
+        return self.corpus.idx[self.position]
+
+    @property
+    def text(self):
+        """
+        Lowercased text of the word
+        :return: str
+        """
+        return self.corpus.text(self.position)
+
+    @property
+    def original_text(self):
+        """
+        String object of word that preserves capitalization
+        :return: str
+        """
+        return self.corpus.original_text(self.position)
+
+    @property
+    def pos(self):
+        """
+        POS tag of the word
+        :return: str
+        """
+        return self.corpus.pos_tag(self.position)
+
+    @property
+    def mw(self):
         """
-        Add a child to this node
-        :param child: the child to add
-        :return: void
+        Multiword expression or conjunction label of the word, if any
+        :return: str or None
         """
-        self.children.append(child)
+        return self.corpus.MWE_LABELS[self.corpus.mw[self.position]]
+
+    @property
+    def tweet_idx(self):
+        """
+        Index of the tweet this node is in
+        :return: int
+        """
+        return self.corpus.tweet_ids[self.corpus.tweet_of(self.position)]
+
+    @property
+    def parent(self):
+        """
+        The parent of this node
+        :return: WordNode, or the raw head index (0 or -1) for roots and unattached words
+        """
+        head = self.corpus.head(self.position)
+        if head is None:
+            return self.corpus.parent[self.position]
+        return self.corpus.word(head)
+
+    @property
+    def children(self):
+        """
+        The children of this node, in token order
+        :return: list of WordNode
+        """
+        return [self.corpus.word(p) for p in self.corpus.children(self.position)]
 
     def has_children(self):
         """
         Does this node have children?
         :return: bool
         """
-        return len(self.children) > 0
+        return len(self.corpus.descendants(self.position)) > 0
 
     def __str__(self):
         """
@@ -69,6 +124,21 @@ class WordNode:
         """
         return self.seed
 
+    def __eq__(self, other):
+        """
+        Nodes are equal when they view the same token
+        :param other: another object
+        :return: bool
+        """
+        return isinstance(other, WordNode) and self.corpus is other.corpus and self.position == other.position
+
+    def __hash__(self):
+        """
+        Hash by the viewed token
+        :return: int
+        """
+        return hash((id(self.corpus), self.position))
+
     def __lt__(self, other):
         """
         Words are ordered by their alphanumeric order
@@ -0,0 +1,214 @@
+"""
+Benchmark the tweet loader and rule extractor on synthetic corpora of several sizes
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime
+from multiprocessing import Process, Queue
+from src.benchmarks.synthetic_corpus import SyntheticCorpus
+from src.baseline.dependency_tweet_loader import TweetLoader
+from src.baseline.dependency_rule_extractor import EmotionCauseRuleExtractor
+from src.BECR.becr_dependency_tweet_loader import BECRTweetLoader
+from src.BECR.becr_dependency_rule_extractor import BECREmotionCauseRuleExtractor
+
+
+class Benchmark:
+    """
+    Times the stages of rule extraction on one corpus file
+    """
+
+    STAGES = ('loading', 'emotion_words', 'build_emo_cause_list')
+
+    def __init__(self, file_name, becr=False, workers=1, repeat=3):
+        """
+        Initialize with the corpus to run on
+        :param file_name: TweeboParser format corpus file
+        :param becr: use the BECR loader and extractor instead of the baseline ones
+        :param workers: number of processes the loader shards parsing across
+        :param repeat: number of timed runs; the fastest time of each stage is kept
+        """
+        self.file_name = file_name
+        self.loader_class = BECRTweetLoader if becr else TweetLoader
+        self.extractor = BECREmotionCauseRuleExtractor() if becr else EmotionCauseRuleExtractor()
+        self.workers = workers
+        self.repeat = repeat
+
+    def run_stages(self, clock):
+        """
+        Run every stage once
+        :param clock: function called after each stage, returning the value recorded for it
+        :return: dict of stage to recorded value, the loader and the emotion cause list
+        """
+        record = {}
+        clock()
+        # the parse cache is left out so every run parses the file
+        tweets = self.loader_class(self.file_name, use_cache=False, workers=self.workers)
+        tweets.corpus, emo_words = tweets.load_corpus()
+        record['loading'] = clock()
+        tweets.index_tweets(emo_words)
+        record['emotion_words'] = clock()
+        emo_list = self.extractor.build_emo_cause_list(tweets.tweet2emo, tweets.idx2tweet)
+        record['build_emo_cause_list'] = clock()
+        return record, tweets, emo_list
+
+    def time_stages(self):
+        """
+        Time the stages, keeping the fastest of the runs
+        :return: dict of stage to seconds, the loader and the emotion cause list
+        """
+        best = {}
+        for _ in range(self.repeat):
+            last = [time.perf_counter()]
+
+            def clock():
+                now = time.perf_counter()
+                elapsed, last[0] = now - last[0], now
+                return elapsed
+
+            times, tweets, emo_list = self.run_stages(clock)
+            for stage, seconds in times.items():
+                best[stage] = min(seconds, best.get(stage, seconds))
+        return best, tweets, emo_list
+
+    def trace_memory(self):
+        """
+        Run the stages once more with allocation tracing, which slows them down too much to time them together
+        :return: dict of stage to the peak traced memory in bytes up to the end of that stage
+        """
+        tracemalloc.start()
+        try:
+            peaks, _, _ = self.run_stages(lambda: tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        return peaks
+
+    def run(self):
+        """
+        Time the stages and measure memory
+        :return: dict of results
+        """
+        times, tweets, emo_list = self.time_stages()
+        peaks = self.trace_memory()
+        total = sum(times.values())
+        return {
+            'tweets': tweets.corpus.next_tweet,
+            'loaded_tweets': len(tweets.corpus),
+            'tokens': len(tweets.corpus.idx),
+            'emotion_words': sum(len(words) for words in tweets.tweet2emo.values()),
+            'relations': len(emo_list),
+            'seconds': times,
+            'total_seconds': total,
+            'tweets_per_sec': tweets.corpus.next_tweet / total if total else None,
+            'peak_traced_mb': {stage: peak / 2 ** 20 for stage, peak in peaks.items()},
+            # ru_maxrss is in kilobytes on Linux
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10,
+        }
+
+
+def run_size(size, args, results):
+    """
+    Generate a corpus of the given size and benchmark it; run in a fresh process
+    so the peak memory of one size does not carry over to the next
+    :param size: number of tweets
+    :param args: parsed command line arguments
+    :param results: queue to put the dict of results on
+    :return: void
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, 'synthetic_{}.out'.format(size))
+        SyntheticCorpus(args.tweet_length, args.tree_depth, args.emotion_density, args.seed).write(file_name, size)
+        results.put(Benchmark(file_name, args.becr, args.workers, args.repeat).run())
+
+
+def get_commit():
+    """
+    Get the commit of the working tree, to label the results with
+    :return: commit hash, or None outside of a git checkout
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(report, compare=None):
+    """
+    Print a table of the results, with speedups against earlier results of the same sizes
+    :param report: dict of results as saved to JSON
+    :param compare: earlier report to compare with, or None
+    :return: void
+    """
+    earlier = {result['tweets']: result for result in compare['results']} if compare else {}
+    print("tweets\ttweets/sec\tpeak MB\t" + "\t".join(Benchmark.STAGES) + ("\tspeedup" if compare else ""))
+    for result in report['results']:
+        row = [str(result['tweets']), "{:.0f}".format(result['tweets_per_sec'] or 0),
+               "{:.1f}".format(max(result['peak_traced_mb'].values()))]
+        row += ["{:.3f}s".format(result['seconds'][stage]) for stage in Benchmark.STAGES]
+        if compare:
+            before = earlier.get(result['tweets'])
+            row.append("{:.2f}x".format(before['total_seconds'] / result['total_seconds']) if before else "-")
+        print("\t".join(row))
+
+
+def parse_args():
+    """
+    Parse the command line arguments
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Corpus sizes in tweets')
+    parser.add_argument('--tweet_length', type=int, default=20, help='Mean number of tokens per tweet')
+    parser.add_argument('--tree_depth', type=int, default=4, help='Maximum dependency tree depth')
+    parser.add_argument('--emotion_density', type=float, default=0.1,
+                        help='Probability of a token being an emotion keyword')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the corpus generator')
+    parser.add_argument('--becr', action='store_true', help='Benchmark the BECR loader and extractor')
+    parser.add_argument('--workers', type=int, default=1, help='Number of loader processes')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per size')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='JSON results of an earlier run to report speedups against')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Benchmark each corpus size and save the results as JSON
+    :return: void
+    """
+    args = parse_args()
+    compare = json.load(open(args.compare)) if args.compare else None
+
+    results = []
+    for size in args.sizes:
+        # not a pool worker, since the loader may start a pool of its own
+        queue = Queue()
+        process = Process(target=run_size, args=(size, args, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    report = {
+        'commit': get_commit(),
+        'date': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'parameters': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w') as out:
+        json.dump(report, out, indent=2)
+    print_results(report, compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Generate synthetic dependency parsed tweets in TweeboParser output format
+"""
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+import random
+from src.baseline.dependency_tweet_loader import TweetLoader
+
+
+class SyntheticCorpus:
+    """
+    Writes random tweets in the CoNLL format of TweeboParser, with a controlled tweet length,
+    dependency tree depth and share of emotion words
+    """
+
+    # filler words and their POS tags, including the modals, negations and prepositions the rules look for
+    FILLER = (('I', 'O'), ('you', 'O'), ('it', 'O'), ('the', 'D'), ('a', 'D'), ('this', 'D'),
+              ('game', 'N'), ('news', 'N'), ('episode', 'N'), ('results', 'N'), ('weekend', 'N'),
+              ('Hannibal', '^'), ('Bernie', '^'), ('BBC', '^'), ('watch', 'V'), ('start', 'V'),
+              ('be', 'V'), ('may', 'V'), ('will', 'V'), ('don\'t', 'V'), ('not', 'R'), ('so', 'R'),
+              ('really', 'R'), ('for', 'P'), ('of', 'P'), ('in', 'P'), ('to', 'P'), ('and', '&'),
+              ('tomorrow', 'N'), ('new', 'A'), ('#tbt', '#'), ('@user', '@'))
+    PUNCTUATION = (('.', ','), (',', ','), ('!', ','), ('"', ','))
+    PUNCTUATION_RATE = 0.1
+    EMOTION_POS = TweetLoader.POS_LIST
+
+    def __init__(self, tweet_length=20, tree_depth=4, emotion_density=0.1, seed=0):
+        """
+        Initialize the generator
+        :param tweet_length: mean number of tokens per tweet; lengths vary by up to half of it either way
+        :param tree_depth: maximum depth of a dependency tree, roots having depth 1
+        :param emotion_density: probability of a token being an emotion keyword
+        :param seed: random seed, so a configuration always yields the same corpus
+        """
+        self.tweet_length = tweet_length
+        self.tree_depth = tree_depth
+        self.emotion_density = emotion_density
+        self.random = random.Random(seed)
+        self.emo_kws = sorted(TweetLoader.emo_kws)
+
+    def get_token(self):
+        """
+        Draw a random token
+        :return: token and POS tag
+        """
+        if self.random.random() < self.emotion_density:
+            return self.random.choice(self.emo_kws), self.random.choice(self.EMOTION_POS)
+        if self.random.random() < self.PUNCTUATION_RATE:
+            return self.random.choice(self.PUNCTUATION)
+        return self.random.choice(self.FILLER)
+
+    def get_tweet(self):
+        """
+        Draw a random tweet with a random dependency tree no deeper than tree_depth
+        :return: list of word feature lists, as the CoNLL reader yields them
+        """
+        length = self.random.randint(max(1, self.tweet_length // 2), max(1, self.tweet_length * 3 // 2))
+        tokens = [self.get_token() for _ in range(length)]
+
+        # attach words in random order to a word already in the tree that still has room below it,
+        # so heads fall on both sides of their dependents
+        parents = [-1] * length
+        depths = {}
+        order = [i for i, (_, pos) in enumerate(tokens) if pos != ',']
+        self.random.shuffle(order)
+        for i in order:
+            heads = [j for j, depth in depths.items() if depth < self.tree_depth]
+            if heads and self.random.random() > 1 / length:
+                head = self.random.choice(heads)
+                parents[i] = head + 1
+                depths[i] = depths[head] + 1
+            else:
+                parents[i] = 0
+                depths[i] = 1
+
+        return [[str(i + 1), token, '_', pos, pos, '_', str(parent), '_']
+                for i, ((token, pos), parent) in enumerate(zip(tokens, parents))]
+
+    def write(self, file_name, tweets):
+        """
+        Write a corpus file
+        :param file_name: the output file
+        :param tweets: the number of tweets
+        :return: void
+        """
+        with open(file_name, 'w') as out:
+            for _ in range(tweets):
+                for word_feats in self.get_tweet():
+                    print("\t".join(word_feats), file=out)
+                print("", file=out)
+
+
+def main():
+    """
+    Write a synthetic corpus: output file, number of tweets, and optionally tweet length, tree depth
+    and emotion word density
+    :return: void
+    """
+    file_name = sys.argv[1]
+    tweets = int(sys.argv[2])
+    tweet_length = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    tree_depth = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    emotion_density = float(sys.argv[5]) if len(sys.argv) > 5 else 0.1
+    SyntheticCorpus(tweet_length, tree_depth, emotion_density).write(file_name, tweets)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 """
-Process GLoVe .txt files and create pickle files for embedding dictionaries
+Process GLoVe .txt files and create memory-mappable embedding stores
 """
 
 import sys
-import pickle
+import os.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.BECR.embedding_store import EmbeddingStore
 
 
 class GloveVectors:
@@ -29,17 +31,17 @@ class GloveVectors:
 
     def save_embeddings(self):
         """
-        Pickle the glove embedding dictionary
+        Write the glove embedding dictionary as an embedding store
         :return: void
         """
         self.make_embeddings()
-        filename = "glove" + str(self.GLOVE_SIZE) + ".pkl"
-        pickle.dump(self.glove_embeddings, open(self.lib_path + filename, 'wb'))
+        filename = "glove" + str(self.GLOVE_SIZE)
+        EmbeddingStore(self.lib_path + filename).save(self.glove_embeddings)
 
 
 def main():
     """
-    Pickle the GloVe Embeddings
+    Store the GloVe Embeddings
     :return: void
     """
     glove = sys.argv[1]
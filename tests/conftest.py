@@ -0,0 +1,10 @@
+"""
+Shared setup of the tests: the modules find the lexicons, seeds and embeddings by paths relative to src/BECR,
+so the tests run from there
+"""
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.chdir(os.path.join(ROOT, 'src', 'BECR'))
@@ -0,0 +1,39 @@
+"""
+Tests of the settings of a RuleBootstrapper
+"""
+import pickle
+import types
+import numpy as np
+from src.BECR.bootstrap_rules import RuleBootstrapper, parse_args
+from src.BECR.context_matrix import ContextMatrix
+
+
+def get_seeds(count, size):
+    return ContextMatrix([np.ones((count, size)) for _ in ContextMatrix.COMPONENTS], np.zeros(count, dtype=bool))
+
+
+def get_chunk_size(seeds, memory_budget, workers=1):
+    bootstrapper = types.SimpleNamespace(glove_size=seeds.vectors[0].shape[1], memory_budget=memory_budget,
+                                         workers=workers)
+    return RuleBootstrapper.get_chunk_size(bootstrapper, seeds)
+
+
+def test_chunk_size_leaves_room_for_the_seeds():
+    seeds = get_seeds(1000, 100)
+    assert seeds.nbytes == 1000 + 2 * 5 * 1000 * 100 * 8
+    row_bytes = 8 * (2 * 5 * 100 + 3 * 1000)
+    budget = 16 * 2 ** 20
+    assert get_chunk_size(seeds, 16) == (budget - seeds.nbytes) // row_bytes
+    assert get_chunk_size(seeds, 16, workers=4) == (budget - seeds.nbytes) // 4 // row_bytes
+
+
+def test_chunk_size_with_seeds_over_the_budget():
+    assert get_chunk_size(get_seeds(1000, 100), 1) == 1
+
+
+def test_workers_get_only_scoring_settings():
+    bootstrapper = RuleBootstrapper(parse_args(['tweets.out', 'out.txt', '--neg_seeds',
+                                                '../../lib/seeds/train_seeds.txt']))
+    copy = pickle.loads(pickle.dumps(bootstrapper))
+    assert sorted(vars(copy)) == sorted(RuleBootstrapper.SCORING_SETTINGS)
+    assert all(getattr(copy, name) == getattr(bootstrapper, name) for name in RuleBootstrapper.SCORING_SETTINGS)
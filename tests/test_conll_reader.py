@@ -0,0 +1,46 @@
+"""
+Tests of the CoNLL reader
+"""
+import os
+import re
+import random
+import pytest
+from src.baseline.conll_reader import ConllReader
+from src.benchmarks.synthetic_corpus import SyntheticCorpus
+
+
+ENDS_WITH_BLANK_LINE = re.compile(rb'.*\n[ \t\r]*\n\Z', re.S)
+
+
+def last_boundary(file_name, start):
+    """
+    The end of the last blank line, found by trying every offset
+    """
+    with open(file_name, 'rb') as f:
+        f.seek(start)
+        data = f.read()
+    ends = [end for end in range(len(data) + 1) if ENDS_WITH_BLANK_LINE.match(data[:end])]
+    return start + ends[-1] if ends else start
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+def test_last_boundary(tmp_path, monkeypatch, seed, chunk_size):
+    rng = random.Random(seed)
+    data = b''.join(rng.choice([b'\n', b' ', b'\t', b'\r', b'a', b'1\tword\n', b'\n\n', b' \n'])
+                    for _ in range(rng.randint(0, 60)))
+    file_name = str(tmp_path / 'tweets.out')
+    with open(file_name, 'wb') as out:
+        out.write(data)
+    monkeypatch.setattr(ConllReader, 'CHUNK_SIZE', chunk_size)
+    for start in range(0, len(data) + 1, 5):
+        assert ConllReader(file_name, start).last_boundary() == last_boundary(file_name, start)
+
+
+def test_last_boundary_leaves_open_tweet(tmp_path):
+    file_name = str(tmp_path / 'tweets.out')
+    SyntheticCorpus(seed=2).write(file_name, 50)
+    size = os.path.getsize(file_name)
+    with open(file_name, 'a') as out:
+        out.write("1\thalf\t_\tN\tN\t_\t0\t_\n")
+    assert ConllReader(file_name).last_boundary() == size
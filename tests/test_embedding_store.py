@@ -0,0 +1,51 @@
+"""
+Tests of the GloVe embedding store
+"""
+import os
+import numpy as np
+from src.BECR.embedding_store import EmbeddingStore
+
+
+def get_embeddings(size):
+    rng = np.random.RandomState(size)
+    return {word: list(rng.rand(size)) for word in ('the', 'happy', 'sad', 'game', "don't")}
+
+
+def test_round_trip(tmp_path):
+    embeddings = get_embeddings(4)
+    store = EmbeddingStore(str(tmp_path / 'glove4'))
+    store.save(embeddings)
+    index, matrix = store.load(4)
+    assert list(index) == list(embeddings)
+    assert np.array_equal(matrix, np.array(list(embeddings.values()), dtype=np.float32))
+    assert os.listdir(str(tmp_path)) == ['glove4' + EmbeddingStore.SUFFIX]
+
+
+def test_other_size_is_not_loaded(tmp_path):
+    store = EmbeddingStore(str(tmp_path / 'glove'))
+    store.save(get_embeddings(3))
+    assert store.load(4) is None
+    store.save(get_embeddings(4))
+    assert store.load(4)[1].shape == (5, 4)
+
+
+def test_incomplete_store_is_not_loaded(tmp_path):
+    store = EmbeddingStore(str(tmp_path / 'glove4'))
+    assert store.load(4) is None
+    store.save(get_embeddings(4))
+    size = os.path.getsize(store.file_name)
+    for keep in (0, 10, size // 2, size - 1):
+        with open(store.file_name, 'r+b') as f:
+            f.truncate(keep)
+        assert store.load(4) is None
+
+
+def test_failed_save_leaves_no_files(tmp_path, monkeypatch):
+    store = EmbeddingStore(str(tmp_path / 'glove4'))
+
+    def replace(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', replace)
+    store.save(get_embeddings(4))
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,47 @@
+"""
+Tests of processing a list of files in one run
+"""
+import sys
+import pytest
+from src.BECR import bootstrap_rules
+from src.BECR.bootstrap_rules import RuleBootstrapper, get_file_pairs, parse_args
+
+
+def test_file_pairs(tmp_path, capsys):
+    file_list = tmp_path / 'files.txt'
+    file_list.write_text("a.out a.txt\n"
+                         "\n"
+                         "my tweets.out\tmy results.txt\n"
+                         "only_one.out\n"
+                         "b.out b.txt extra\n"
+                         "c.out\t\n"
+                         "  d.out   d.txt  \r\n")
+    args = parse_args(['--test', '--file_list', str(file_list)])
+    assert list(get_file_pairs(args)) == [('a.out', 'a.txt'), ('my tweets.out', 'my results.txt'),
+                                          ('d.out', 'd.txt')]
+    assert capsys.readouterr().err.count('skipping') == 3
+
+
+def test_failed_file_does_not_stop_run(tmp_path, monkeypatch, capsys):
+    file_list = tmp_path / 'files.txt'
+    file_list.write_text("bad.out bad.txt\ngood.out good.txt\n")
+    processed = []
+
+    def process_file(self, parsed_tweet_file, output_file):
+        if parsed_tweet_file == 'bad.out':
+            raise ValueError('bad parse')
+        processed.append(parsed_tweet_file)
+
+    monkeypatch.setattr(RuleBootstrapper, 'process_file', process_file)
+    monkeypatch.setattr(sys, 'argv', ['bootstrap_rules.py', '--test', '--file_list', str(file_list)])
+    with pytest.raises(SystemExit) as exit_info:
+        bootstrap_rules.main()
+    assert exit_info.value.code == 1
+    assert processed == ['good.out']
+    assert 'failed to process bad.out' in capsys.readouterr().err
+
+
+def test_file_list_requires_test(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(['--file_list', 'files.txt'])
+    assert '--file_list requires --test' in capsys.readouterr().err
@@ -0,0 +1,34 @@
+"""
+Tests of writing the relations
+"""
+import io
+import types
+import pytest
+from src.BECR.bootstrap_rules import RuleBootstrapper, parse_args
+
+
+def get_relation(index, cosine):
+    word = types.SimpleNamespace(text='word{}'.format(index))
+    return types.SimpleNamespace(cosine=cosine, emotion=types.SimpleNamespace(phrase=[word]), cause=[word],
+                                 tweet=types.SimpleNamespace(raw='tweet {}'.format(index)))
+
+
+def write_relations(relations, top_k):
+    out = io.StringIO()
+    RuleBootstrapper.write_relations(types.SimpleNamespace(top_k=top_k, write_relation=RuleBootstrapper.write_relation),
+                                     relations, out)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('top_k', [1, 3, 5, 20])
+def test_top_k_is_head_of_sorted_output(top_k):
+    relations = [get_relation(i, cosine) for i, cosine in enumerate([0.7, 0.9, 0.7, 0.8, 0.9, 0.75, 0.7])]
+    everything = write_relations(relations, None).split('\n\n')
+    assert write_relations(relations, top_k).split('\n\n')[:-1] == everything[:min(top_k, len(relations))]
+
+
+@pytest.mark.parametrize('top_k', ['0', '-5'])
+def test_top_k_must_be_positive(top_k):
+    with pytest.raises(SystemExit):
+        parse_args(['in.out', 'out.txt', '--top_k', top_k])
+    assert parse_args(['in.out', 'out.txt', '--top_k', '1']).top_k == 1
@@ -0,0 +1,76 @@
+"""
+Tests of the binary parse cache
+"""
+import os
+import pytest
+from src.baseline.dependency_tweet_loader import TweetLoader
+from src.baseline.parse_cache import ParseCache
+from src.benchmarks.synthetic_corpus import SyntheticCorpus
+
+
+@pytest.fixture
+def corpus_file(tmp_path):
+    file_name = str(tmp_path / 'tweets.out')
+    SyntheticCorpus(seed=1).write(file_name, 200)
+    return file_name
+
+
+def load(file_name, use_cache=True):
+    loader = TweetLoader(file_name, use_cache=use_cache)
+    loader.extract_emo_relations()
+    return loader
+
+
+def test_cache_round_trip(corpus_file):
+    parsed = load(corpus_file, use_cache=False)
+    load(corpus_file)
+    assert os.path.exists(corpus_file + ParseCache.SUFFIX)
+
+    cached = load(corpus_file)
+    assert cached.idx2tweet == parsed.idx2tweet
+    assert {i: [w.text for w in words] for i, words in cached.tweet2emo.items()} == \
+           {i: [w.text for w in words] for i, words in parsed.tweet2emo.items()}
+
+
+@pytest.mark.parametrize('keep', [0, 3, 40, -100])
+def test_damaged_cache_is_rewritten(corpus_file, keep):
+    parsed = load(corpus_file, use_cache=False)
+    load(corpus_file)
+    cache_file = corpus_file + ParseCache.SUFFIX
+    size = os.path.getsize(cache_file)
+
+    # a crash while writing leaves a cache cut short anywhere, header included
+    with open(cache_file, 'r+b') as f:
+        f.truncate(keep % size)
+    assert ParseCache(corpus_file, TweetLoader(corpus_file).get_filter_key()).load() is None
+
+    assert load(corpus_file).idx2tweet == parsed.idx2tweet
+    assert os.path.getsize(cache_file) == size
+    assert load(corpus_file).idx2tweet == parsed.idx2tweet
+
+
+def test_save_never_writes_into_the_cache_in_place(corpus_file):
+    load(corpus_file)
+    cache_file = corpus_file + ParseCache.SUFFIX
+    with open(cache_file, 'rb') as f:
+        # a reader of the old cache keeps its bytes while another run saves the cache again
+        old = f.read()
+        cache = ParseCache(corpus_file, TweetLoader(corpus_file).get_filter_key())
+        cache.save(load(corpus_file, use_cache=False).corpus)
+        f.seek(0)
+        assert f.read() == old
+        assert not os.path.samestat(os.fstat(f.fileno()), os.stat(cache_file))
+    assert os.stat(cache_file).st_mode & 0o777 == ParseCache.MODE
+    assert sorted(os.listdir(os.path.dirname(corpus_file))) == ['tweets.out', 'tweets.out' + ParseCache.SUFFIX]
+
+
+def test_failed_save_leaves_no_temporary_file(corpus_file, monkeypatch):
+    corpus = load(corpus_file, use_cache=False).corpus
+
+    def pad(self, out):
+        raise ValueError('no padding')
+
+    monkeypatch.setattr(ParseCache, 'pad', pad)
+    with pytest.raises(ValueError):
+        ParseCache(corpus_file).save(corpus)
+    assert os.listdir(os.path.dirname(corpus_file)) == ['tweets.out']
@@ -0,0 +1,97 @@
+"""
+Tests of the subtree index the rule extractors use against the recursive dependency walk it replaces
+"""
+import pytest
+from src.baseline.dependency_rule_extractor import EmotionCauseRuleExtractor
+from src.baseline.dependency_tweet_loader import TweetLoader
+from src.benchmarks.synthetic_corpus import SyntheticCorpus
+
+
+def recursive_dependencies(word_list, deps):
+    """
+    All dependencies of the given nodes, gathered as the baseline did
+    """
+    if not word_list:
+        return deps
+    word = word_list.pop()
+    deps.append(word)
+    word_list.extend(word.children)
+    return recursive_dependencies(word_list, deps)
+
+
+def reachable_dependencies(word):
+    """
+    All nodes below a node, visiting each once, so a cyclic parse ends
+    """
+    deps, positions, word_list = [], set(), word.children[:]
+    while word_list:
+        dep = word_list.pop()
+        if dep.position not in positions:
+            positions.add(dep.position)
+            deps.append(dep)
+            word_list.extend(dep.children)
+    return deps
+
+
+def baseline_cause(extractor, word, rule, deps):
+    """
+    The cause of a rule as the baseline got it from the dependencies of a node
+    """
+    deps = sorted(deps, key=lambda w: w.idx)
+    lhs = [d for d in deps if d.idx < word.idx]
+    rhs = [d for d in deps if d.idx > word.idx]
+    if rule == 2:
+        return extractor.strip_prepositions(lhs) if lhs else None
+    elif rule == 3:
+        return extractor.strip_prepositions(rhs[1:]) if len(rhs) > 2 else None
+    return extractor.strip_prepositions(rhs) if rhs else None
+
+
+def positions(words):
+    return None if words is None else [w.position for w in words]
+
+
+def check_corpus(file_name, get_dependencies):
+    tweets = TweetLoader(file_name, use_cache=False, prefilter=False)
+    tweets.extract_emo_relations()
+    corpus = tweets.corpus
+    extractor = EmotionCauseRuleExtractor()
+    checked = 0
+    for tweet_idx in range(len(corpus)):
+        for word in corpus.words(tweet_idx):
+            deps = get_dependencies(word)
+            assert list(corpus.descendants(word.position)) == sorted(d.position for d in deps)
+            assert word.has_children() == bool(word.children)
+            for rule in (1, 2, 3):
+                assert positions(extractor.get_emotion_cause(word, rule)) == \
+                    positions(baseline_cause(extractor, word, rule, deps))
+            checked += 1
+    return checked
+
+
+def test_real_parses():
+    checked = check_corpus('../../outputs/tb_parser/tweets_small_sample_set.out',
+                           lambda word: recursive_dependencies(word.children[:], []))
+    assert checked > 100
+
+
+@pytest.mark.parametrize('tweet_length, tree_depth', [(20, 4), (60, 30), (10, 1)])
+def test_synthetic_trees(tmp_path, tweet_length, tree_depth):
+    file_name = str(tmp_path / 'tweets.out')
+    SyntheticCorpus(tweet_length, tree_depth, seed=5).write(file_name, 100)
+    assert check_corpus(file_name, lambda word: recursive_dependencies(word.children[:], [])) > 500
+
+
+def test_cyclic_parse(tmp_path):
+    # 1 -> 2 -> 3 -> 1 is a cycle, 4 hangs off it and 5 is a separate root
+    file_name = tmp_path / 'tweets.out'
+    file_name.write_text("1\tso\t_\tR\tR\t_\t2\t_\n"
+                         "2\thappy\t_\tA\tA\t_\t3\t_\n"
+                         "3\tfor\t_\tP\tP\t_\t1\t_\n"
+                         "4\tyou\t_\tO\tO\t_\t1\t_\n"
+                         "5\t!\t_\t,\t,\t_\t0\t_\n"
+                         "\n")
+    assert check_corpus(str(file_name), reachable_dependencies) == 5
+    corpus = TweetLoader(str(file_name), use_cache=False, prefilter=False)
+    corpus.extract_emo_relations()
+    assert list(corpus.corpus.descendants(0)) == [0, 1, 2, 3]
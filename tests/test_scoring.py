@@ -0,0 +1,310 @@
+"""
+Tests of the faster scoring and loading paths against the scalar implementations they replace, on a synthetic corpus
+"""
+import io
+from collections import Counter
+import numpy as np
+import pytest
+from src.benchmarks.synthetic_corpus import SyntheticCorpus
+from src.BECR.becr_dependency_tweet_loader import BECRTweetLoader
+from src.BECR.bootstrap_rules import RuleBootstrapper, parse_args
+from src.BECR.context_matrix import ContextMatrix
+from src.BECR.seed import Seed
+from src.BECR.seed_model import SeedModel
+
+GLOVE_SIZE = 25
+# results of the scalar implementations, which are slow to compute
+EXPECTED = {}
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    file_name = str(tmp_path / 'tweets.out')
+    SyntheticCorpus(seed=4).write(file_name, 400)
+    # random vectors stand in for GloVe, with some words left without one
+    words = [word for word, _ in SyntheticCorpus.FILLER + SyntheticCorpus.PUNCTUATION] + sorted(
+        BECRTweetLoader.emo_kws)
+    words = [word for i, word in enumerate(words) if i % 7]
+    rng = np.random.RandomState(0)
+    monkeypatch.setattr(Seed, 'glove_index', {word: row for row, word in enumerate(words)})
+    monkeypatch.setattr(Seed, 'glove_matrix', rng.standard_normal((len(words), GLOVE_SIZE)).astype(np.float32))
+    return file_name
+
+
+def get_bootstrapper(*args):
+    return RuleBootstrapper(parse_args(['tweets.out', 'out.txt', '--tau', '0.6', '--neg_tau', '0.5'] + list(args)))
+
+
+def load(bootstrapper, file_name, workers=1):
+    tweets = BECRTweetLoader(file_name, use_cache=False, workers=workers)
+    return tweets, bootstrapper.get_emo_list(tweets)
+
+
+def get_seed_matches(bootstrapper, emo_list, tweets):
+    """
+    Make every 20th emotion cause pair an initial seed match, and every third of those a bad seed
+    """
+    seed_matches = []
+    for i, (emo, cause, _) in enumerate(emo_list[::20]):
+        if emo.seed or emo.bad_seed:
+            continue
+        seed = Seed(emo, cause, tweets.tweets_by_idx[emo.tweet_idx], bootstrapper.glove_size)
+        bootstrapper.get_seed_contexts(seed, emo, cause)
+        seed.bad = i % 3 == 0
+        seed.cosine, seed.cycle = (0, 0) if seed.bad else (1.0, 0)
+        emo.bad_seed, emo.seed = seed.bad, not seed.bad
+        seed_matches.append(seed)
+    return seed_matches
+
+
+def scalar_scores(bootstrapper, candidate_seed, seeds):
+    """
+    Score a candidate against every seed one pair at a time, as bootstrapping did before the matrix scoring
+    """
+    b = bootstrapper
+    bad, max_cosine = False, 0
+    for seed in seeds:
+        if seed.bad:
+            bad = bad or b.cosine_sim(seed, candidate_seed, b.neg_alpha, b.neg_beta, b.neg_gamma, b.neg_delta,
+                                      b.neg_epsilon) > b.neg_tau
+        else:
+            cos_sim = b.cosine_sim(seed, candidate_seed, b.alpha, b.beta, b.gamma, b.delta, b.epsilon)
+            if cos_sim > b.tau:
+                max_cosine = cos_sim if cos_sim > max_cosine else max_cosine
+    return bad, 0 if bad else max_cosine
+
+
+def scalar_bootstrapping(bootstrapper, emo_list, seed_matches, tweets):
+    """
+    Run bootstrapping comparing every candidate with every seed match in every cycle
+    """
+    candidates = bootstrapper.set_all_contexts(emo_list, tweets.tweets_by_idx)
+    for cycle in range(1, bootstrapper.cycles + 1):
+        new_seeds = []
+        for candidate_seed in candidates:
+            if candidate_seed.emotion.seed or candidate_seed.emotion.bad_seed:
+                continue
+            bad, max_cosine = scalar_scores(bootstrapper, candidate_seed, seed_matches)
+            candidate_seed.bad = candidate_seed.bad or bad
+            if max_cosine > 0 and not candidate_seed.bad:
+                candidate_seed.emotion.seed = True
+                candidate_seed.cosine, candidate_seed.cycle = max_cosine, cycle
+                new_seeds.append(candidate_seed)
+            elif candidate_seed.bad:
+                candidate_seed.emotion.bad_seed = True
+                candidate_seed.cosine, candidate_seed.cycle = 0, cycle
+                new_seeds.append(candidate_seed)
+        seed_matches.extend(new_seeds)
+        # with no new seed matches, the next cycle would find the same as this one
+        if not new_seeds:
+            break
+    return seed_matches
+
+
+def describe(seeds):
+    return [(seed.emotion.tweet_idx, seed.emotion.idx, tuple(c.idx for c in seed.cause), bool(seed.bad),
+             seed.cosine, seed.cycle) for seed in seeds]
+
+
+def get_candidates(bootstrapper, file_name):
+    tweets, emo_list = load(bootstrapper, file_name)
+    return ContextMatrix.from_seeds(bootstrapper.set_all_contexts(emo_list, tweets.tweets_by_idx), GLOVE_SIZE)
+
+
+def test_weighted_sim_matches_cosine_sim(corpus):
+    bootstrapper = get_bootstrapper()
+    candidates = get_candidates(bootstrapper, corpus)
+    rng = np.random.RandomState(1)
+    weights = tuple(rng.rand(5))
+    rows, columns = rng.choice(len(candidates), 30, replace=False), rng.choice(len(candidates), 40, replace=False)
+    sim = candidates.weighted_sim(candidates, weights, rows, columns)
+    alpha, beta, gamma, epsilon, delta = weights
+    for i, row in enumerate(rows):
+        for j, column in enumerate(columns):
+            expected = bootstrapper.cosine_sim(candidates.row(column), candidates.row(row), alpha, beta, gamma,
+                                               delta, epsilon)
+            assert sim[i, j] == pytest.approx(expected, rel=0, abs=1e-12)
+
+
+@pytest.mark.parametrize('threshold', [-0.5, 0.3, 0.6, 0.9])
+def test_pruned_sim_matches_full_sum(corpus, threshold, monkeypatch):
+    monkeypatch.setattr(ContextMatrix, 'PRUNE_BLOCK', 16)
+    candidates = get_candidates(get_bootstrapper(), corpus)
+    rows, columns = np.arange(0, len(candidates), 2), np.arange(1, len(candidates), 3)
+    for weights in [(0.2, 0.5, 0.2, 0.1, 0), (0, 0, 0, 0.5, 0.5), (0.3, -0.2, 0.1, 0, 0.4)]:
+        full = candidates.weighted_sim(candidates, weights, rows, columns)
+        pruned = candidates.weighted_sim(candidates, weights, rows, columns, threshold)
+        # a pair is only dropped once it cannot get above the threshold, up to the rounding of the sums
+        above = full > threshold + 1e-12
+        assert np.allclose(pruned[above], full[above], rtol=0, atol=1e-12)
+        assert np.all(pruned[~above] <= threshold + 1e-12)
+
+
+@pytest.mark.parametrize('args', [[], ['--pattern_tau', '0.7'], ['--memory_budget', '0.01']])
+def test_score_rows_matches_scalar(corpus, args):
+    bootstrapper = get_bootstrapper(*args)
+    tweets, emo_list = load(bootstrapper, corpus)
+    seed_matches = get_seed_matches(bootstrapper, emo_list, tweets)
+    candidate_seeds = bootstrapper.set_all_contexts(emo_list, tweets.tweets_by_idx)
+    # the prefix sums of a tweet are only kept while its candidates are embedded
+    assert all(candidate_seed.tweet.prefix_embeddings is None for candidate_seed in candidate_seeds)
+    seeds = ContextMatrix.from_seeds(seed_matches, GLOVE_SIZE)
+
+    scores = bootstrapper.score_candidates(candidate_seeds, seeds, bootstrapper.tau, 0)
+    expected = [scalar_scores(bootstrapper, candidate_seed, seed_matches) for candidate_seed in candidate_seeds]
+    assert scores == expected
+    assert any(bad for bad, _ in scores) and any(max_cosine for _, max_cosine in scores)
+
+
+@pytest.mark.parametrize('args', [[], ['--pattern_tau', '0.7'], ['--workers', '2'], ['--memory_budget', '0.01'],
+                                  ['--candidate_store', '.']])
+def test_bootstrapping_matches_scalar(corpus, tmp_path, monkeypatch, args):
+    # with small chunks, the pool scores even this corpus
+    monkeypatch.setattr(RuleBootstrapper, 'SCORE_CHUNK', 16)
+    args = [str(tmp_path) if arg == '.' else arg for arg in args]
+    bootstrapper = get_bootstrapper(*args)
+
+    # the variants only change how the same scores are computed, so the slow scalar run is shared
+    if 'bootstrapping' not in EXPECTED:
+        tweets, emo_list = load(bootstrapper, corpus)
+        EXPECTED['bootstrapping'] = describe(scalar_bootstrapping(
+            bootstrapper, emo_list, get_seed_matches(bootstrapper, emo_list, tweets), tweets))
+    expected = EXPECTED['bootstrapping']
+
+    # later cycles only compare candidates with the seed matches added since their last cycle
+    tweets, emo_list = load(bootstrapper, corpus)
+    seed_matches = bootstrapper.run_bootstrapping(emo_list, get_seed_matches(bootstrapper, emo_list, tweets),
+                                                  tweets.tweets_by_idx)
+    assert describe(seed_matches) == expected
+    assert len({cycle for *_, cycle in expected}) > 2 and any(bad and cycle for *_, bad, _, cycle in expected)
+
+
+def test_test_phase_matches_scalar(corpus):
+    bootstrapper = get_bootstrapper('--test')
+    tweets, emo_list = load(bootstrapper, corpus)
+    seed_matches = get_seed_matches(bootstrapper, emo_list, tweets)
+    candidates = bootstrapper.set_all_contexts(emo_list, tweets.tweets_by_idx)
+    expected = []
+    for candidate_seed in candidates:
+        bad, max_cosine = scalar_scores(bootstrapper, candidate_seed, seed_matches)
+        if bad or max_cosine > 0:
+            expected.append((candidate_seed.emotion.tweet_idx, candidate_seed.emotion.idx,
+                             tuple(c.idx for c in candidate_seed.cause), bad, 0 if bad else max_cosine, 0))
+
+    tweets, emo_list = load(bootstrapper, corpus)
+    model = SeedModel.from_seeds(get_seed_matches(bootstrapper, emo_list, tweets), GLOVE_SIZE)
+    relations = bootstrapper.run_bootstrapping(emo_list, model, tweets.tweets_by_idx)
+    # candidates sharing an emotion word are decided in turn, so only the first of them is kept
+    kept = {}
+    for relation in expected:
+        kept.setdefault(relation[:2], relation)
+    assert describe(relations) == sorted(kept.values(), key=expected.index)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_sharded_loading_matches_one_process(corpus, workers):
+    bootstrapper = get_bootstrapper()
+    tweets, emo_list = load(bootstrapper, corpus)
+    sharded_tweets, sharded_emo_list = load(bootstrapper, corpus, workers)
+
+    assert sharded_tweets.idx2tweet == tweets.idx2tweet
+    assert [(t.idx, t.tokens) for t in sharded_tweets.tweets_by_idx.values()] == \
+        [(t.idx, t.tokens) for t in tweets.tweets_by_idx.values()]
+
+    def describe_pairs(pairs):
+        return [(emo.tweet_idx, emo.idx, [w.text for w in emo.phrase], [(w.idx, w.text, w.pos) for w in cause])
+                for emo, cause, _ in pairs]
+    assert describe_pairs(sharded_emo_list) == describe_pairs(emo_list)
+    assert len(emo_list) > 100
+
+
+def test_incremental_runs_match_one_full_run(corpus, tmp_path, monkeypatch):
+    # a seed model from the synthetic corpus stands in for test_seeds.model
+    bootstrapper = get_bootstrapper()
+    tweets, emo_list = load(bootstrapper, corpus)
+    model_file = str(tmp_path / 'test_seeds.model')
+    SeedModel.from_seeds(get_seed_matches(bootstrapper, emo_list, tweets), GLOVE_SIZE).save(model_file)
+    monkeypatch.setattr(RuleBootstrapper, 'TEST_SEEDS_FILE', model_file)
+
+    full_file = str(tmp_path / 'full.txt')
+    get_bootstrapper('--test', '--no_cache').process_file(corpus, full_file)
+
+    # tweets are appended to the input between runs, and one run finds nothing appended
+    tweet_texts = [text + '\n\n' for text in open(corpus).read().split('\n\n')[:-1]]
+    growing_file, incremental_file = str(tmp_path / 'growing.out'), str(tmp_path / 'incremental.txt')
+    incremental = get_bootstrapper('--test', '--no_cache', '--incremental')
+    open(growing_file, 'w').close()
+    for start, end in [(0, 150), (150, 151), (151, 151), (151, len(tweet_texts))]:
+        with open(growing_file, 'a') as f:
+            f.write(''.join(tweet_texts[start:end]))
+        incremental.process_file(growing_file, incremental_file)
+
+    # each run appends its relations sorted by score, so only the whole set matches the full run
+    def get_relations(file_name):
+        return sorted(open(file_name).read().split('\n\n'))
+    relations = get_relations(full_file)
+    assert len(relations) > 20
+    assert get_relations(incremental_file) == relations
+
+
+def test_prefilter_keeps_the_relations(corpus):
+    bootstrapper = get_bootstrapper()
+    results = []
+    for prefilter in (True, False):
+        tweets = BECRTweetLoader(corpus, use_cache=False, prefilter=prefilter)
+        emo_list = bootstrapper.get_emo_list(tweets)
+        seed_matches = bootstrapper.run_bootstrapping(emo_list, get_seed_matches(bootstrapper, emo_list, tweets),
+                                                      tweets.tweets_by_idx)
+        results.append((len(tweets.corpus), describe(seed_matches)))
+    (filtered, relations), (unfiltered, unfiltered_relations) = results
+    # the prefilter skips the tweets without an emotion word, which have no candidates
+    assert filtered < unfiltered == 400
+    assert relations == unfiltered_relations
+    assert len({cycle for *_, cycle in relations}) > 2
+
+
+class FlushLog(io.StringIO):
+    """
+    Text file that keeps what was written before each flush
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.flushed = []
+
+    def flush(self):
+        self.flushed.append(self.getvalue()[sum(len(text) for text in self.flushed):])
+
+
+@pytest.mark.parametrize('args', [[], ['--candidate_store', '.']])
+def test_early_stop_streams_each_cycle(corpus, tmp_path, capsys, args):
+    args = [str(tmp_path) if arg == '.' else arg for arg in args]
+    bootstrapper = get_bootstrapper(*args)
+    tweets, emo_list = load(bootstrapper, corpus)
+    full = describe(bootstrapper.run_bootstrapping(emo_list, get_seed_matches(bootstrapper, emo_list, tweets),
+                                                   tweets.tweets_by_idx))
+    counts = Counter(cycle for *_, cycle in full)
+    min_new_seeds = 10
+    stop = min(cycle for cycle in range(1, max(counts) + 2) if counts[cycle] < min_new_seeds)
+    assert 1 < stop < max(counts)
+
+    capsys.readouterr()
+    bootstrapper = get_bootstrapper('--min_new_seeds', str(min_new_seeds), '--stream', *args)
+    tweets, emo_list = load(bootstrapper, corpus)
+    seed_matches = get_seed_matches(bootstrapper, emo_list, tweets)
+    out = FlushLog()
+    bootstrapper.stream_relations(seed_matches, out)
+    seed_matches = bootstrapper.run_bootstrapping(emo_list, seed_matches, tweets.tweets_by_idx)
+    # the run stops after the first cycle that adds fewer seeds, with what the full run had found up to it
+    assert describe(seed_matches) == [seed for seed in full if seed[-1] <= stop]
+    assert capsys.readouterr().err.count('seeds added') == stop
+
+    # relations are written a cycle at a time as they are accepted, starting with the initial seed matches
+    expected = []
+    for cycle in range(stop + 1):
+        cycle_out = io.StringIO()
+        for seed in seed_matches:
+            if seed.cycle == cycle:
+                bootstrapper.write_relation(seed, cycle_out)
+        expected.append(cycle_out.getvalue())
+    assert out.flushed == expected
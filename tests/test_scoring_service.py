@@ -0,0 +1,50 @@
+"""
+Tests of the scoring service
+"""
+import json
+import types
+import pytest
+from src.BECR.bootstrap_rules import parse_args
+from src.BECR.scoring_service import ScoringService
+
+
+def get_service(score_batch, tmp_path):
+    bootstrapper = types.SimpleNamespace(load_models=lambda: None, score_batch=score_batch)
+    service = ScoringService(bootstrapper, 2, str(tmp_path))
+    service.start()
+    return service
+
+
+def test_scored_batch(tmp_path):
+    def score_batch(batch_file, out):
+        out.write(open(batch_file).read().upper())
+        return 1
+
+    service = get_service(score_batch, tmp_path)
+    response = service.submit(b'a\tb\n')
+    service.stop()
+    lines = response.split(b'\n')
+    assert lines[0] == b'A\tB'
+    assert json.loads(lines[1][len(ScoringService.METRICS):])['relations'] == 1
+    assert lines[2:] == [ScoringService.BATCH_END, b'']
+
+
+def test_error_stays_on_one_line(tmp_path):
+    def score_batch(batch_file, out):
+        raise ValueError("bad batch\nline 2\r\nline 3")
+
+    service = get_service(score_batch, tmp_path)
+    response = service.submit(b'a\n')
+    service.stop()
+    lines = response.split(b'\n')
+    assert lines[0] == ScoringService.ERROR + b'bad batch line 2 line 3'
+    assert lines[1].startswith(ScoringService.METRICS)
+    assert lines[2:] == [ScoringService.BATCH_END, b'']
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('queue_size', ['0', '-1'])
+def test_queue_size_must_be_positive(queue_size):
+    with pytest.raises(SystemExit):
+        parse_args(['--test', '--serve', '-', '--queue_size', queue_size])
+    assert parse_args(['--test', '--serve', '-', '--queue_size', '1']).queue_size == 1
@@ -0,0 +1,52 @@
+"""
+Tests of the context embeddings of seeds
+"""
+import numpy as np
+import pytest
+from src.BECR.seed import Seed
+
+
+class Tweet:
+    prefix_embeddings = None
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+
+@pytest.fixture
+def glove(monkeypatch):
+    rng = np.random.RandomState(0)
+    words = ['w%d' % i for i in range(50)]
+    monkeypatch.setattr(Seed, 'glove_index', {word: row for row, word in enumerate(words)})
+    monkeypatch.setattr(Seed, 'glove_matrix', rng.standard_normal((len(words), 5)).astype(np.float32) * 100)
+    return words
+
+
+def sequential_sum(words, size):
+    """
+    The context embedding as the baseline computes it: the vectors added one word at a time to 1e-28
+    """
+    embedding = np.full(size, 1.e-28)
+    for word in words:
+        if word in Seed.glove_index:
+            embedding += np.array(Seed.glove_matrix[Seed.glove_index[word]], dtype=np.float64)
+    return embedding
+
+
+def test_span_embedding(glove):
+    rng = np.random.RandomState(1)
+    for _ in range(20):
+        # a long tweet, with words that have no vector
+        tokens = [glove[i] if i < len(glove) else 'unknown' for i in rng.randint(0, 60, 80)]
+        tweet = Tweet(tokens)
+        seed = Seed(None, None, tweet, 5)
+        # a difference of prefix sums is off from the sequential sum by rounding of the sums up to the whole tweet
+        tolerance = 1e-14 * np.abs(sequential_sum(tokens, 5)).max() * len(tokens)
+        for start, stop in [(0, 0), (0, 5), (3, 40), (10, -1), (0, 80), (79, -1), (50, 20), (0, -1)]:
+            embedding = seed.get_span_embedding(start, stop)
+            assert np.allclose(embedding, sequential_sum(tokens[start:stop], 5), rtol=0, atol=tolerance)
+            assert np.allclose(embedding, seed.calc_glove_score(tokens[start:stop]), rtol=0, atol=tolerance)
+        # the sums are computed once per tweet, for all of its seeds
+        prefix = tweet.prefix_embeddings
+        Seed(None, None, tweet, 5).get_span_embedding(0, 10)
+        assert tweet.prefix_embeddings is prefix
@@ -0,0 +1,50 @@
+"""
+Tests of loading emotion cause pairs
+"""
+import pickle
+from src.BECR.bootstrap_rules import RuleBootstrapper
+
+TRAIN_SEEDS = '../../lib/seeds/train_seeds.txt'
+
+
+def test_train_seeds_text():
+    seed_pairs = RuleBootstrapper.load_seed_pairs(TRAIN_SEEDS)
+    with open(TRAIN_SEEDS) as f:
+        lines = f.read().splitlines()
+    assert all(':' in line for line in lines)
+    assert len(seed_pairs) == len(lines)
+    assert seed_pairs['bad'] == ['appendicitis', 'evening']
+    assert seed_pairs["wouldn't be surprised"] == ['he had frank ocean credits']
+    assert seed_pairs['not afraid'] == ['tomorrow'] * 6
+    assert seed_pairs['love'][-3:] == ["weighing myself and seeing i've lost weight", 'you', 'ryan braun']
+    assert sum(len(causes) for causes in seed_pairs.values()) == sum(line.count(',') + 1 for line in lines)
+
+
+def test_train_seeds_text_is_lowercase_pickle():
+    # the text lists the emotions of the pickled training pairs, lowercased
+    with open('../../lib/seeds/train_seeds.pkl', 'rb') as f:
+        pickled = pickle.load(f)
+    seed_pairs = RuleBootstrapper.load_seed_pairs(TRAIN_SEEDS)
+    assert all(emotion == emotion.lower() for emotion in seed_pairs)
+    shared = set(seed_pairs) & set(pickled)
+    assert len(shared) > len(seed_pairs) // 2
+    for emotion in shared:
+        assert pickled[emotion][0].lower() == seed_pairs[emotion][0]
+
+
+def test_seed_pairs_text_format(tmp_path):
+    seed_file = tmp_path / 'seeds.txt'
+    seed_file.write_text("sad : leaving ,  movie\n"
+                         "no colon here\n"
+                         "\n"
+                         "sad: losing you, \n"
+                         "happy: 10:30 train\n")
+    assert RuleBootstrapper.load_seed_pairs(str(seed_file)) == {'sad': ['leaving', 'movie', 'losing you'],
+                                                                'happy': ['10:30 train']}
+
+
+def test_seed_pairs_pickle(tmp_path):
+    seed_file = tmp_path / 'seeds.pkl'
+    with open(str(seed_file), 'wb') as f:
+        pickle.dump({'Sad': ['Leaving, again']}, f)
+    assert RuleBootstrapper.load_seed_pairs(str(seed_file)) == {'Sad': ['Leaving, again']}
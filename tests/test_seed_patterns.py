@@ -0,0 +1,83 @@
+"""
+Tests of the seed patterns against comparing candidates with every seed
+"""
+import numpy as np
+import pytest
+from src.BECR.context_matrix import ContextMatrix
+from src.BECR.seed_model import SeedModel
+from src.BECR.seed_patterns import SeedPatterns
+
+WEIGHTS = (0.2, 0.5, 0.2, 0.1, 0)
+
+
+def get_matrix(rng, count, bad=0.0, groups=6):
+    # seeds around a few directions, so they fall into patterns
+    centers = rng.standard_normal((groups, len(ContextMatrix.COMPONENTS), 8))
+    picked = centers[rng.randint(0, groups, count)]
+    return ContextMatrix([picked[:, k] + 0.3 * rng.standard_normal((count, 8))
+                          for k in range(len(ContextMatrix.COMPONENTS))], rng.rand(count) < bad)
+
+
+def test_add_groups_every_seed_within_its_radius():
+    rng = np.random.RandomState(0)
+    seeds = get_matrix(rng, 200, bad=0.3)
+    patterns = SeedPatterns(False, WEIGHTS, 0.8).add(seeds[:120]).add(seeds[120:], 120)
+    assert patterns.count == 200
+    assert np.array_equal(np.sort(patterns.columns), np.flatnonzero(~seeds.bad))
+    assert 1 < len(patterns) < len(patterns.columns)
+    for k, (components, centroids) in enumerate(zip(seeds.components, patterns.centroids)):
+        cos = np.einsum('ij,ij->i', components[patterns.columns], centroids[patterns.labels])
+        assert np.all(np.arccos(np.clip(cos, -1, 1)) <= patterns.radii[patterns.labels, k] + 1e-12)
+
+
+def test_add_rejects_skipped_seeds():
+    rng = np.random.RandomState(0)
+    seeds = get_matrix(rng, 20)
+    with pytest.raises(ValueError):
+        SeedPatterns(False, WEIGHTS, 0.8).add(seeds[10:], 10)
+
+
+@pytest.mark.parametrize('pattern_tau', [0.5, 0.8, 0.95])
+@pytest.mark.parametrize('start', [0, 70])
+def test_weighted_sim_keeps_the_scores_above_threshold(pattern_tau, start):
+    rng = np.random.RandomState(1)
+    seeds, candidates = get_matrix(rng, 150), get_matrix(rng, 80)
+    patterns = SeedPatterns(False, WEIGHTS, pattern_tau)
+    for batch in (0, 40, 100):
+        patterns.add(seeds[batch:], batch)
+    compared = seeds[start:]
+    rows = np.arange(len(candidates))
+    threshold = 0.6
+
+    selected = patterns.select(start)
+    sim = np.full((len(rows), len(compared)), -np.inf)
+    sim[:, selected.columns] = selected.weighted_sim(candidates, compared, WEIGHTS, rows, threshold)
+    full = candidates.weighted_sim(compared, WEIGHTS, rows, slice(None))
+    above = full > threshold
+    assert above.any() and not above.all()
+    assert np.allclose(sim[above], full[above], rtol=0, atol=1e-12)
+    assert np.all(sim[~above] <= threshold)
+
+
+def test_model_keeps_patterns(tmp_path):
+    rng = np.random.RandomState(2)
+    seeds = get_matrix(rng, 60, bad=0.2)
+    patterns = (SeedPatterns(True, WEIGHTS[::-1], 0.7).add(seeds), SeedPatterns(False, WEIGHTS, 0.7).add(seeds))
+    file_name = str(tmp_path / 'seeds.model')
+    SeedModel(seeds, np.ones(len(seeds)), np.zeros(len(seeds), dtype=np.int64), ['e'] * len(seeds),
+              ['c'] * len(seeds), patterns).save(file_name)
+
+    pattern_file = str(tmp_path / 'seeds.patterns')
+    SeedPatterns.save_pair(patterns, pattern_file)
+    for loaded in (SeedModel.load(file_name).patterns, SeedPatterns.load_pair(pattern_file)):
+        check_same_patterns(patterns, loaded)
+
+
+def check_same_patterns(patterns, loaded):
+    for saved, restored in zip(patterns, loaded):
+        assert (restored.bad, restored.weights, restored.pattern_tau, restored.count) == \
+            (saved.bad, saved.weights, saved.pattern_tau, saved.count)
+        for name in ('radii', 'columns', 'labels'):
+            assert np.array_equal(getattr(restored, name), getattr(saved, name))
+        for restored_centroids, saved_centroids in zip(restored.centroids, saved.centroids):
+            assert np.array_equal(restored_centroids, saved_centroids)
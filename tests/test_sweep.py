@@ -0,0 +1,46 @@
+"""
+Tests of the parameter sweep
+"""
+import types
+import numpy as np
+import pytest
+from src.BECR.context_matrix import ContextMatrix
+from src.BECR.sweep import ParameterSweep
+
+
+def get_matrix(rng, count, bad=0.0):
+    return ContextMatrix([rng.standard_normal((count, 4)) + 0.5 for _ in ContextMatrix.COMPONENTS],
+                         rng.rand(count) < bad)
+
+
+@pytest.mark.parametrize('is_test', [False, True])
+def test_chunked_replay_matches_precomputed(tmp_path, is_test):
+    rng = np.random.RandomState(3)
+    seeds, candidates = get_matrix(rng, 6, bad=0.3), get_matrix(rng, 300)
+    space = seeds if is_test else ContextMatrix(
+        [np.concatenate(v) for v in zip(seeds.vectors, candidates.vectors)],
+        np.concatenate([seeds.bad, np.zeros(len(candidates), dtype=bool)]))
+    emotion_groups = rng.randint(0, 200, len(candidates))
+
+    grid_file = tmp_path / 'grid.json'
+    grid_file.write_text('{}')
+    bootstrapper = types.SimpleNamespace(is_test=is_test, cycles=5, min_new_seeds=1, memory_budget=0.001)
+    sweep = ParameterSweep(bootstrapper, str(grid_file))
+    sweep.space, sweep.candidates = space, candidates
+
+    configuration = {'alpha': 0.2, 'beta': 0.5, 'gamma': 0.2, 'epsilon': 0.1, 'delta': 0,
+                     'neg_alpha': 0, 'neg_beta': 0, 'neg_gamma': 0, 'neg_epsilon': 0.5, 'neg_delta': 0.5,
+                     'tau': 0.6, 'neg_tau': 0.7}
+    similarities = {k: np.clip(space.components[k] @ candidates.components[k].T, -1, 1) for k in range(5)}
+    sims = sweep.combine(similarities, [configuration[name] for name in sweep.WEIGHTS], len(space), len(candidates))
+    neg_sims = sweep.combine(similarities, [configuration[name] for name in sweep.NEG_WEIGHTS], len(space),
+                             len(candidates))
+
+    precomputed = sweep.replay(configuration, sims, neg_sims, space.bad, len(seeds), emotion_groups, 200)
+    chunked = sweep.replay(configuration, None, None, space.bad, len(seeds), emotion_groups, 200)
+    assert precomputed['new_seeds'] > 0 and precomputed['new_bad_seeds'] > 0
+    for key in ('cycles', 'new_seeds', 'new_bad_seeds'):
+        assert precomputed[key] == chunked[key]
+    assert np.array_equal(precomputed['decisions'][0], chunked['decisions'][0])
+    assert np.allclose(precomputed['decisions'][1], chunked['decisions'][1], rtol=0, atol=1e-12)
+    assert np.array_equal(precomputed['decisions'][2], chunked['decisions'][2])